@@ -1,6 +1,6 @@
 """Module entrypoint to run the Typer app with `python -m tasker`."""
 
-from .cli import app
+from .cli import run
 
 if __name__ == "__main__":
-    app()
+    run()
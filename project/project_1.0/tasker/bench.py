@@ -0,0 +1,183 @@
+"""Synthetic load generator for `tasker bench`.
+
+Builds a synthetic dataset through `TaskDB` and then drives a mixed read/write
+workload from several threads sharing one `TaskDB` (the neo4j driver is thread
+safe and pools connections), recording per-operation latencies.
+
+Every synthetic task carries the `BENCH_TAG` tag so it can be told apart from
+real data and removed afterwards.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+import random
+import threading
+import time
+
+from .db import TaskDB
+from .metrics import percentile
+
+BENCH_TAG = "bench"
+
+READ_OPS = ("get_task", "list_by_tag", "get_links")
+WRITE_OPS = ("create_task", "update_task", "complete_task", "create_link")
+
+
+def _tag_names(count: int) -> List[str]:
+    """Synthetic tag names `bench-0` .. `bench-<count-1>`."""
+    return [f"{BENCH_TAG}-{i}" for i in range(count)]
+
+
+def _tag_weights(count: int, skew: float) -> List[float]:
+    """Zipf-like weights so a few tags are popular and most are rare (`skew=0` is uniform)."""
+    return [1.0 / (i + 1) ** skew for i in range(count)]
+
+
+def seed(
+    db: TaskDB,
+    tasks: int,
+    tags: int,
+    tags_per_task: int,
+    skew: float,
+    links_per_task: float,
+    rng: random.Random,
+) -> List[str]:
+    """Create the synthetic dataset and return the ids of the created tasks.
+
+    Links only point from later tasks to earlier ones, so the generated
+    dependency graph is acyclic.
+    """
+    names = _tag_names(tags)
+    weights = _tag_weights(tags, skew)
+    ids: List[str] = []
+    for i in range(tasks):
+        picked = set(rng.choices(names, weights=weights, k=tags_per_task)) if names else set()
+        task = db.create_task(f"bench task {i}", f"synthetic task {i}", tags=[BENCH_TAG, *sorted(picked)])
+        ids.append(task["id"])
+    for _ in range(int(links_per_task * tasks)):
+        if len(ids) < 2:
+            break
+        a, b = sorted(rng.sample(range(len(ids)), 2))
+        db.create_link(ids[b], ids[a])
+    return ids
+
+
+class Workload:
+    """Mixed read/write workload over a seeded dataset."""
+
+    def __init__(self, db: TaskDB, ids: List[str], tags: int, write_ratio: float, seed: int):
+        self._db = db
+        self._ids = list(ids)
+        self._ids_lock = threading.Lock()
+        self._tags = _tag_names(tags) or [BENCH_TAG]
+        self._write_ratio = write_ratio
+        self._seed = seed
+
+    @property
+    def ids(self) -> List[str]:
+        """All task ids known to the workload, including ones it created."""
+        with self._ids_lock:
+            return list(self._ids)
+
+    def _pick_id(self, rng: random.Random) -> str:
+        with self._ids_lock:
+            return rng.choice(self._ids)
+
+    def _operation(self, name: str, rng: random.Random) -> Callable[[], object]:
+        """Return a zero-argument callable performing one `name` operation."""
+        db = self._db
+        if name == "get_task":
+            tid = self._pick_id(rng)
+            return lambda: db.get_task(tid)
+        if name == "list_by_tag":
+            tag = rng.choice(self._tags)
+            return lambda: db.list_tasks(tag=tag)
+        if name == "get_links":
+            tid = self._pick_id(rng)
+            return lambda: db.get_links(tid)
+        if name == "create_task":
+            tags = [BENCH_TAG, rng.choice(self._tags)]
+
+            def create() -> None:
+                task = db.create_task("bench task (workload)", tags=tags)
+                with self._ids_lock:
+                    self._ids.append(task["id"])
+
+            return create
+        if name == "update_task":
+            tid = self._pick_id(rng)
+            desc = f"updated {rng.random():.6f}"
+            return lambda: db.update_task(tid, description=desc)
+        if name == "complete_task":
+            tid = self._pick_id(rng)
+            return lambda: db.complete_task(tid)
+        if name == "create_link":
+            a, b = self._pick_id(rng), self._pick_id(rng)
+            return lambda: db.create_link(a, b, kind="bench")
+        raise ValueError(f"unknown operation: {name}")
+
+    def _worker(self, worker: int, deadline: float) -> Tuple[Dict[str, List[float]], Dict[str, int]]:
+        rng = random.Random(self._seed + worker)
+        latencies: Dict[str, List[float]] = {}
+        errors: Dict[str, int] = {}
+        while time.perf_counter() < deadline:
+            ops = WRITE_OPS if rng.random() < self._write_ratio else READ_OPS
+            name = rng.choice(ops)
+            op = self._operation(name, rng)
+            start = time.perf_counter()
+            try:
+                op()
+            except Exception:
+                errors[name] = errors.get(name, 0) + 1
+                continue
+            latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        return latencies, errors
+
+    def run(self, workers: int, duration: float) -> Dict[str, Dict]:
+        """Run for `duration` seconds with `workers` threads.
+
+        Returns per-operation stats: `count`, `errors`, `ops_per_sec`,
+        `p50`, `p95`, `p99` (milliseconds), plus a `total` entry.
+        """
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda w: self._worker(w, deadline), range(workers)))
+        elapsed = max(time.perf_counter() - start, 1e-9)
+
+        merged: Dict[str, List[float]] = {}
+        errors: Dict[str, int] = {}
+        for lat, err in results:
+            for name, values in lat.items():
+                merged.setdefault(name, []).extend(values)
+            for name, n in err.items():
+                errors[name] = errors.get(name, 0) + n
+        merged["total"] = [v for name in list(merged) for v in merged[name]]
+        errors["total"] = sum(errors.values())
+
+        stats: Dict[str, Dict] = {}
+        for name in (*READ_OPS, *WRITE_OPS, "total"):
+            values = sorted(merged.get(name, []))
+            if not values and not errors.get(name):
+                continue
+            stats[name] = {
+                "count": len(values),
+                "errors": errors.get(name, 0),
+                "ops_per_sec": len(values) / elapsed,
+                "p50": percentile(values, 50) if values else 0.0,
+                "p95": percentile(values, 95) if values else 0.0,
+                "p99": percentile(values, 99) if values else 0.0,
+            }
+        return stats
+
+
+def cleanup(db: TaskDB, ids: List[str], tags: int) -> Tuple[int, int]:
+    """Delete the given synthetic tasks, then the synthetic tags they leave unused.
+
+    `tags` is the `--tags` count the dataset was built with. Returns the number
+    of tasks and tags removed.
+    """
+    for tid in ids:
+        db.delete_task(tid)
+    return len(ids), db.delete_unused_tags([BENCH_TAG, *_tag_names(tags)])
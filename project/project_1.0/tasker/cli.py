@@ -1,30 +1,160 @@
 """Typer CLI for managing tasks stored in Neo4j."""
 from __future__ import annotations
 
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Callable, Iterator, List, Optional, TextIO, Tuple, TypeVar
 import os
 import typer
+import contextlib
 import json
-import openai
-import traceback
+import random
+import shlex
+import sys
+import time
 from dotenv import load_dotenv
 
-from .db import TaskDB
+from . import bench as bench_mod
+from . import completion
+from . import metrics
+from . import offline
+from .db import DEFAULT_MAX_RETRY_TIME, TaskDB
+from .graph import LinkGraph, analyze
 
 load_dotenv()
 
 app = typer.Typer(help="Tasker CLI using Neo4j")
 
+T = TypeVar("T")
 
-def _get_db() -> TaskDB:
-    """Create a TaskDB using environment variables. Exits on missing config."""
+# Target database chosen with the global `--database` option (or NEO4J_DATABASE).
+_database: Optional[str] = None
+# Name of the subcommand being run, used for the metrics record.
+_command: Optional[str] = None
+# Set by the global `--offline` option: writes go to the local queue.
+_offline = False
+# True while `batch` runs its commands; they inherit its global options.
+_in_batch = False
+
+
+class _BorrowedDB:
+    """TaskDB stand-in handed out by `_get_db` during `batch`.
+
+    Commands close the database they get when they finish; for a batch the
+    connection must outlive every command, so `close()` does nothing here.
+    """
+
+    def __init__(self, db: TaskDB):
+        self._db = db
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._db, name)
+
+    def close(self) -> None:
+        """Leave the shared database open; `batch` closes it."""
+
+
+# Shared database used by every command while `batch` runs.
+_shared_db: Optional[_BorrowedDB] = None
+
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    database: Optional[str] = typer.Option(
+        None,
+        "--database",
+        envvar="NEO4J_DATABASE",
+        help="Neo4j database to use (defaults to the user's home database)",
+    ),
+    offline: bool = typer.Option(
+        False,
+        "--offline",
+        envvar="TASKER_OFFLINE",
+        help="Queue add/complete/edit/link/delete locally instead of writing to Neo4j (upload with `sync`)",
+    ),
+) -> None:
+    """Tasker CLI using Neo4j."""
+    global _database, _command, _offline
+    if not _in_batch:
+        _database = database or None
+        _offline = offline
+    # commands run by `batch` re-enter the app; keep the outer command name
+    _command = _command or ctx.invoked_subcommand
+
+
+def run() -> None:
+    """Run the CLI and append a metrics record for the invocation."""
+    metrics.start()
+    code = 0
+    try:
+        app()
+    except SystemExit as exc:
+        code = exc.code if isinstance(exc.code, int) else (0 if exc.code is None else 1)
+        raise
+    except BaseException:
+        code = 1
+        raise
+    finally:
+        if _command:
+            metrics.record(_command, code)
+
+
+def _parse_bool(value: str) -> bool:
+    """Parse a boolean setting such as `true`/`false`, `1`/`0`, `yes`/`no`."""
+    lowered = value.strip().lower()
+    if lowered in ("1", "true", "yes", "on"):
+        return True
+    if lowered in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(value)
+
+
+def _env_setting(name: str, parse: Callable[[str], T], default: Optional[T] = None) -> Optional[T]:
+    """Read an optional setting from the environment (or `.env`). Exits on invalid values."""
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return parse(raw)
+    except ValueError:
+        typer.echo(f"Invalid value for {name}: {raw}")
+        raise typer.Exit(code=1)
+
+
+def _get_db(warm: bool = True, **overrides: Any) -> TaskDB:
+    """Create a TaskDB using environment variables. Exits on missing config.
+
+    Keyword arguments override the matching `TaskDB` settings from the environment.
+    `warm=False` skips the `NEO4J_WARMUP` pool warm-up.
+    """
+    if _shared_db is not None:
+        return _shared_db
     uri = os.getenv("NEO4J_URI")
     user = os.getenv("NEO4J_USER")
     password = os.getenv("NEO4J_PASSWORD")
     if not (uri and user and password):
         typer.echo("Missing NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD environment variables. See `.env.example`.")
         raise typer.Exit(code=1)
-    return TaskDB(uri, user, password)
+    settings = {
+        "max_retry_time": _env_setting("NEO4J_MAX_RETRY_TIME", float, DEFAULT_MAX_RETRY_TIME),
+        "database": _database,
+        "max_pool_size": _env_setting("NEO4J_MAX_POOL_SIZE", int),
+        "acquisition_timeout": _env_setting("NEO4J_ACQUISITION_TIMEOUT", float),
+        "connection_timeout": _env_setting("NEO4J_CONNECTION_TIMEOUT", float),
+        "fetch_size": _env_setting("NEO4J_FETCH_SIZE", int),
+        "keep_alive": _env_setting("NEO4J_KEEP_ALIVE", _parse_bool),
+    }
+    settings.update(overrides)
+    db = TaskDB(uri, user, password, **settings)
+    warmup = _env_setting("NEO4J_WARMUP", int, 0) if warm else 0
+    if warmup:
+        try:
+            db.warm_up(warmup)
+        except Exception:
+            db.close()
+            raise
+    return db
 
 
 def suggest_tags_with_openai(title: str, description: str | None) -> List[str]:
@@ -40,6 +170,10 @@ def suggest_tags_with_openai(title: str, description: str | None) -> List[str]:
     if not api_key:
         return []
 
+    # imported lazily: the openai package takes most of a second to import,
+    # which every other command (and shell completion) would otherwise pay
+    import openai
+
     # try to set legacy API key if present; new client ignores this
     try:
         openai.api_key = api_key
@@ -62,6 +196,7 @@ def suggest_tags_with_openai(title: str, description: str | None) -> List[str]:
     )
 
     content = ""
+    start = time.perf_counter()
     try:
         OpenAIClient = getattr(openai, "OpenAI", None)
         if OpenAIClient is not None:
@@ -84,6 +219,8 @@ def suggest_tags_with_openai(title: str, description: str | None) -> List[str]:
             content = resp["choices"][0]["message"]["content"].strip()
     except Exception:
         return []
+    finally:
+        metrics.add_openai_time(_elapsed_ms(start))
 
     content = content.strip()
     if not content:
@@ -146,68 +283,111 @@ def suggest_tags_with_openai(title: str, description: str | None) -> List[str]:
     return out
 
 
-@app.command()
-def check() -> None:
-    """Run health checks for Neo4j and OpenAI (if configured)."""
-    ok = True
+def _elapsed_ms(start: float) -> float:
+    """Milliseconds elapsed since a `time.perf_counter()` reading."""
+    return (time.perf_counter() - start) * 1000
 
-    # Check Neo4j
-    typer.echo("Checking Neo4j...")
+
+def _check_neo4j(timeout: float) -> Tuple[Optional[bool], str]:
+    """Time driver connection setup and a first query; returns (ok, detail)."""
+    if not (os.getenv("NEO4J_URI") and os.getenv("NEO4J_USER") and os.getenv("NEO4J_PASSWORD")):
+        return False, "not configured (NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD missing)"
+    db: Optional[TaskDB] = None
     try:
-        db = _get_db()
-        try:
-            with db._driver.session() as session:
-                r = session.run("RETURN 1 AS v")
-                row = r.single()
-                if row and row.get("v") == 1:
-                    typer.secho("  Neo4j: OK", fg=typer.colors.GREEN)
-                else:
-                    typer.secho("  Neo4j: unexpected result", fg=typer.colors.YELLOW)
-                    ok = False
-        finally:
+        # no pool warm-up: the check times a single connection and must not hang on it
+        db = _get_db(warm=False, connection_timeout=timeout, acquisition_timeout=timeout, max_retry_time=0.0)
+        connect_ms, query_ms = db.ping()
+        return True, f"connect {connect_ms:.0f} ms, first query {query_ms:.0f} ms"
+    except typer.Exit:
+        # _env_setting already printed which value is invalid
+        return False, "invalid settings"
+    except Exception as exc:
+        # includes a malformed NEO4J_URI (ConfigurationError) and an unreachable server
+        return False, f"{type(exc).__name__}: {exc}"
+    finally:
+        if db is not None:
             db.close()
-    except Exception:
-        typer.secho("  Neo4j: FAILED", fg=typer.colors.RED)
-        traceback.print_exc()
-        ok = False
 
-    # Check OpenAI
-    typer.echo("Checking OpenAI...")
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        typer.secho("  OpenAI: not configured (OPENAI_API_KEY missing)", fg=typer.colors.YELLOW)
-        ok = ok and True
-    else:
-        try:
-            # Prefer new client
-            OpenAIClient = getattr(openai, "OpenAI", None)
-            if OpenAIClient is not None:
-                client = OpenAIClient()
-                resp = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": "Respond with a single word: pong"}],
-                    max_tokens=10,
-                    temperature=0.0,
-                )
-                content = resp.choices[0].message.content.strip()
-            else:
-                resp = openai.ChatCompletion.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": "Respond with a single word: pong"}],
-                    max_tokens=10,
-                    temperature=0.0,
-                )
-                content = resp["choices"][0]["message"]["content"].strip()
-            typer.secho(f"  OpenAI: OK (response: {content})", fg=typer.colors.GREEN)
-        except Exception:
-            typer.secho("  OpenAI: FAILED", fg=typer.colors.RED)
-            traceback.print_exc()
+
+def _check_openai(timeout: float) -> Tuple[Optional[bool], str]:
+    """Time a call to the (free) model list endpoint; returns (ok, detail)."""
+    if not os.getenv("OPENAI_API_KEY"):
+        return None, "not configured (OPENAI_API_KEY missing)"
+    start = time.perf_counter()
+    try:
+        import openai
+
+        # Prefer new client
+        OpenAIClient = getattr(openai, "OpenAI", None)
+        if OpenAIClient is not None:
+            client = OpenAIClient(timeout=timeout, max_retries=0)
+            client.models.list()
+        else:
+            openai.api_key = os.getenv("OPENAI_API_KEY")
+            openai.Model.list(request_timeout=timeout)
+        return True, f"API reachable in {_elapsed_ms(start):.0f} ms"
+    except Exception as exc:
+        return False, f"{type(exc).__name__}: {exc}"
+    finally:
+        metrics.add_openai_time(_elapsed_ms(start))
+
+
+@app.command()
+def check(
+    timeout: float = typer.Option(5.0, "--timeout", help="Seconds to wait for each service"),
+) -> None:
+    """Run health checks for Neo4j and OpenAI (if configured) in parallel and report latencies."""
+    checks = {"Neo4j": _check_neo4j, "OpenAI": _check_openai}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(checks)) as pool:
+        futures = {name: pool.submit(fn, timeout) for name, fn in checks.items()}
+        results = {name: fut.result() for name, fut in futures.items()}
+    total_ms = _elapsed_ms(start)
+
+    ok = True
+    for name, (status, detail) in results.items():
+        if status is None:
+            typer.secho(f"  {name}: {detail}", fg=typer.colors.YELLOW)
+        elif status:
+            typer.secho(f"  {name}: OK ({detail})", fg=typer.colors.GREEN)
+        else:
+            typer.secho(f"  {name}: FAILED ({detail})", fg=typer.colors.RED)
             ok = False
+    typer.echo(f"Checks completed in {total_ms:.0f} ms")
 
     if not ok:
         raise typer.Exit(code=2)
 
 
+def _validate_due(value: Optional[str]) -> Optional[str]:
+    """Typer callback checking that a due date is an ISO date (YYYY-MM-DD)."""
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise typer.BadParameter(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def _schedule_display(task: dict) -> str:
+    """Format a task's due date and priority for list output (empty if neither is set)."""
+    parts = []
+    if task.get("due"):
+        parts.append(f"due {task['due']}")
+    if task.get("priority") is not None:
+        parts.append(f"p{task['priority']}")
+    return f" ({', '.join(parts)})" if parts else ""
+
+
+def _resolve_offline_id(identifier: str) -> str:
+    """Resolve an identifier from the local index while offline. Exits if unknown."""
+    try:
+        return offline.resolve(identifier, _database)
+    except LookupError as exc:
+        typer.echo(str(exc))
+        raise typer.Exit(code=2)
+
+
 def _resolve_task_id(identifier: str, db: TaskDB) -> str:
     """Resolve a user-supplied identifier to a full task id.
 
@@ -247,14 +427,25 @@ def _resolve_task_id(identifier: str, db: TaskDB) -> str:
 def add(
     title: str = typer.Argument(..., help="Title of the task"),
     description: Optional[str] = typer.Option(None, "-d", "--description", help="Optional task description"),
-    tags: Optional[List[str]] = typer.Option(None, "-t", "--tag", help="Tag(s) for the task; pass multiple times"),
+    tags: Optional[List[str]] = typer.Option(None, "-t", "--tag", help="Tag(s) for the task; pass multiple times", autocompletion=completion.complete_tag),
+    due: Optional[str] = typer.Option(None, "--due", help="Due date (YYYY-MM-DD)", callback=_validate_due),
+    priority: Optional[int] = typer.Option(None, "-p", "--priority", min=1, max=5, help="Priority from 1 (most urgent) to 5"),
+    parent: Optional[str] = typer.Option(None, "--parent", help="Make this a subtask of the given task (index, short id, or full id)", autocompletion=completion.complete_task),
     suggest: bool = typer.Option(False, "--suggest", help="Use OpenAI to suggest tags for this task (requires OPENAI_API_KEY)"),
 ) -> None:
     """Add a new task."""
+    if _offline:
+        parent_id = _resolve_offline_id(parent) if parent else None
+        task_id = offline.enqueue_add(title, description or "", list(tags) if tags else [], due=due, priority=priority, parent=parent_id, database=_database)
+        typer.echo(f"Queued task {task_id[:8]}: {title}")
+        if suggest:
+            typer.echo("Tag suggestions are not available offline.")
+        return
     db = _get_db()
     try:
         tag_list = list(tags) if tags else []
-        task = db.create_task(title, description or "", tags=tag_list)
+        parent_id = _resolve_task_id(parent, db) if parent else None
+        task = db.create_task(title, description or "", tags=tag_list, due=due, priority=priority, parent_id=parent_id)
         short = (task.get("id") or "")[:8]
         typer.echo(f"Created task {short}: {task.get('title')}")
 
@@ -281,7 +472,7 @@ def add(
 @app.command("list")
 def list_tasks(
     status: str = typer.Option("all", "-s", "--status", help="Filter tasks: all|done|todo"),
-    tag: Optional[str] = typer.Option(None, "-t", "--tag", help="Filter tasks by a tag"),
+    tag: Optional[str] = typer.Option(None, "-t", "--tag", help="Filter tasks by a tag", autocompletion=completion.complete_tag),
 ) -> None:
     """List tasks (all, done, or todo)."""
     db = _get_db()
@@ -293,6 +484,9 @@ def list_tasks(
             only_done = False
 
         items = db.list_tasks(only_done=only_done, tag=tag)
+        if only_done is None and not tag:
+            # we already have every task: refresh the shell completion index for free
+            completion.write_cache(items, database=_database)
         if not items:
             typer.echo("No tasks found.")
             return
@@ -302,14 +496,19 @@ def list_tasks(
             short = t.get("id", "")[:8]
             tags_out = ",".join(t.get("tags", [])) if t.get("tags") else ""
             tag_display = f" [{tags_out}]" if tags_out else ""
-            typer.echo(f"{i:2d}. {short} [{mark}] {t.get('title')}{tag_display} - {desc}")
+            typer.echo(f"{i:2d}. {short} [{mark}] {t.get('title')}{tag_display}{_schedule_display(t)} - {desc}")
     finally:
         db.close()
 
 
 @app.command()
-def complete(task_id: str = typer.Argument(..., help="ID of the task to mark done")) -> None:
+def complete(task_id: str = typer.Argument(..., help="ID of the task to mark done", autocompletion=completion.complete_task)) -> None:
     """Mark a task as completed."""
+    if _offline:
+        full_id = _resolve_offline_id(task_id)
+        offline.enqueue("complete", _database, id=full_id)
+        typer.echo(f"Queued completion of {full_id[:8]}")
+        return
     db = _get_db()
     try:
         full_id = _resolve_task_id(task_id, db)
@@ -324,8 +523,13 @@ def complete(task_id: str = typer.Argument(..., help="ID of the task to mark don
 
 
 @app.command()
-def delete(task_id: str = typer.Argument(..., help="ID of the task to delete")) -> None:
+def delete(task_id: str = typer.Argument(..., help="ID of the task to delete", autocompletion=completion.complete_task)) -> None:
     """Delete a task by id."""
+    if _offline:
+        full_id = _resolve_offline_id(task_id)
+        offline.enqueue("delete", _database, id=full_id)
+        typer.echo(f"Queued deletion of {full_id[:8]}")
+        return
     db = _get_db()
     try:
         full_id = _resolve_task_id(task_id, db)
@@ -376,23 +580,29 @@ def delete_completed(yes: bool = typer.Option(False, "--yes", "-y", help="Skip c
 
 @app.command()
 def edit(
-    task: str = typer.Argument(..., help="Task identifier (index|short id|full id)"),
+    task: str = typer.Argument(..., help="Task identifier (index|short id|full id)", autocompletion=completion.complete_task),
     title: Optional[str] = typer.Option(None, "--title", "-T", help="New title"),
     description: Optional[str] = typer.Option(None, "--description", "-d", help="New description"),
-    tags: Optional[List[str]] = typer.Option(None, "-t", "--tag", help="Replace tags (pass multiple times). If omitted tags are unchanged."),
+    tags: Optional[List[str]] = typer.Option(None, "-t", "--tag", help="Replace tags (pass multiple times). If omitted tags are unchanged.", autocompletion=completion.complete_tag),
     clear_tags: bool = typer.Option(False, "--clear-tags", help="Remove all tags from the task"),
+    due: Optional[str] = typer.Option(None, "--due", help="New due date (YYYY-MM-DD)", callback=_validate_due),
+    priority: Optional[int] = typer.Option(None, "-p", "--priority", min=1, max=5, help="New priority from 1 (most urgent) to 5"),
 ) -> None:
-    """Edit a task's title, description, and/or tags."""
+    """Edit a task's title, description, tags, due date and/or priority."""
+    tag_list = None
+    if clear_tags:
+        tag_list = []
+    elif tags is not None:
+        tag_list = list(tags)
+    if _offline:
+        full_id = _resolve_offline_id(task)
+        offline.enqueue("edit", _database, id=full_id, title=title, description=description, tags=tag_list, due=due, priority=priority)
+        typer.echo(f"Queued update of {full_id[:8]}")
+        return
     db = _get_db()
     try:
         full_id = _resolve_task_id(task, db)
-        tag_list = None
-        if clear_tags:
-            tag_list = []
-        elif tags is not None:
-            tag_list = list(tags)
-
-        updated = db.update_task(full_id, title=title, description=description, tags=tag_list)
+        updated = db.update_task(full_id, title=title, description=description, tags=tag_list, due=due, priority=priority)
         if not updated:
             typer.echo("Task not found.")
             raise typer.Exit(code=2)
@@ -404,11 +614,11 @@ def edit(
 
 @app.command("init-db")
 def init_db() -> None:
-    """Create DB constraints (Task.id unique, Tag.name unique)."""
+    """Create DB constraints (Task.id unique, Tag.name unique) and the due/priority indexes."""
     db = _get_db()
     try:
         db.create_constraints()
-        typer.echo("DB constraints created (if they did not already exist).")
+        typer.echo("DB constraints and indexes created (if they did not already exist).")
     finally:
         db.close()
 
@@ -426,11 +636,17 @@ def migrate_tags() -> None:
 
 @app.command()
 def link(
-    source: str = typer.Argument(..., help="Source task (index, short id, or full id)"),
-    target: str = typer.Argument(..., help="Target task (index, short id, or full id)"),
+    source: str = typer.Argument(..., help="Source task (index, short id, or full id)", autocompletion=completion.complete_task),
+    target: str = typer.Argument(..., help="Target task (index, short id, or full id)", autocompletion=completion.complete_task),
     kind: str = typer.Option("depends", "-k", "--kind", help="Kind of link (stored in relationship `kind`)")
 ) -> None:
     """Create a link from SOURCE -> TARGET (relationship stored with `kind`)."""
+    if _offline:
+        src_id = _resolve_offline_id(source)
+        tgt_id = _resolve_offline_id(target)
+        offline.enqueue("link", _database, source=src_id, target=tgt_id, kind=kind)
+        typer.echo(f"Queued link {src_id[:8]} -[{kind}]-> {tgt_id[:8]}")
+        return
     db = _get_db()
     try:
         src_id = _resolve_task_id(source, db)
@@ -450,8 +666,8 @@ def link(
 
 @app.command()
 def unlink(
-    source: str = typer.Argument(..., help="Source task (index, short id, or full id)"),
-    target: str = typer.Argument(..., help="Target task (index, short id, or full id)"),
+    source: str = typer.Argument(..., help="Source task (index, short id, or full id)", autocompletion=completion.complete_task),
+    target: str = typer.Argument(..., help="Target task (index, short id, or full id)", autocompletion=completion.complete_task),
     kind: str = typer.Option("depends", "-k", "--kind", help="Kind of link to remove"),
 ) -> None:
     """Remove a link of the given kind from SOURCE -> TARGET. Prints number removed."""
@@ -473,7 +689,7 @@ def unlink(
 
 
 @app.command()
-def links(task_id: str = typer.Argument(..., help="Task (index, short id, or full id) to show links for")) -> None:
+def links(task_id: str = typer.Argument(..., help="Task (index, short id, or full id) to show links for", autocompletion=completion.complete_task)) -> None:
     """Show links for a task (both outgoing and incoming)."""
     db = _get_db()
     try:
@@ -491,3 +707,367 @@ def links(task_id: str = typer.Argument(..., help="Task (index, short id, or ful
             typer.echo(f"{i:2d}. {dir_sym} {short} [{it.get('kind')}] {t.get('title')}{tag_display}")
     finally:
         db.close()
+
+
+@app.command("critical-path")
+def critical_path(
+    kind: str = typer.Option("depends", "-k", "--kind", help="Link kind to analyse ('all' for every kind)"),
+    top: int = typer.Option(5, "-n", "--top", help="Number of top blocking tasks to show"),
+    impact: int = typer.Option(0, "--impact", help="Also count tasks blocked transitively, up to this many per task (0 ranks by direct blocks only)"),
+) -> None:
+    """Show the longest dependency chain, the tasks that block the most work, and cycles."""
+    db = _get_db()
+    try:
+        data = db.get_link_graph(kind=None if kind == "all" else kind)
+    finally:
+        db.close()
+
+    graph = LinkGraph.from_rows(data["tasks"], data["links"])
+    if not len(graph):
+        typer.echo("No links found.")
+        return
+    result = analyze(graph, impact_limit=impact)
+
+    def _label(u: int) -> str:
+        mark = "✓" if graph.done[u] else " "
+        return f"{graph.ids[u][:8]} [{mark}] {graph.titles[u]}"
+
+    typer.echo(f"Critical path ({len(result.critical_path)} task(s), first to last):")
+    for i, u in enumerate(result.critical_path, start=1):
+        typer.echo(f"{i:2d}. {_label(u)}")
+
+    blockers = sorted((u for u in range(len(graph)) if result.fan_out[u]), key=lambda u: (-result.impact[u], -result.fan_out[u]))
+    if blockers:
+        typer.echo("Top blocking tasks:")
+        for u in blockers[:top]:
+            if impact > 0:
+                count = f"more than {impact}" if result.impact[u] > impact else str(result.impact[u])
+                blocks = f"blocks {count} task(s) ({result.fan_out[u]} direct)"
+            else:
+                blocks = f"blocks {result.fan_out[u]} task(s) directly"
+            typer.echo(f"  {_label(u)} - {blocks}, slack {result.slack[u]}")
+
+    if result.cycles:
+        typer.secho(f"Dependency cycles ({len(result.cycles)}):", fg=typer.colors.YELLOW)
+        for comp in result.cycles:
+            typer.echo("  " + " -> ".join(graph.ids[u][:8] for u in comp + comp[:1]))
+        typer.echo(f"{len(result.unordered)} task(s) on or behind a cycle were left out of the path analysis.")
+
+
+@app.command()
+def tags(
+    min_count: int = typer.Option(1, "--min-count", help="Only show tags used by at least this many tasks (0 includes unused tags)"),
+    sort: str = typer.Option("count", "--sort", help="Sort order: count|name"),
+    prefix: Optional[str] = typer.Option(None, "--prefix", help="Only show tags starting with this prefix"),
+) -> None:
+    """List tags with their open/done task counts."""
+    if sort not in ("count", "name"):
+        typer.echo(f"Invalid sort: {sort} (expected count|name)")
+        raise typer.Exit(code=2)
+    db = _get_db()
+    try:
+        items = db.list_tags(min_count=min_count, sort=sort, prefix=prefix)
+        if not items:
+            typer.echo("No tags found.")
+            return
+        width = max(len(t["name"]) for t in items)
+        for t in items:
+            typer.echo(f"{t['name']:<{width}}  {t['total']:4d} total  {t['open']:4d} open  {t['done']:4d} done")
+    finally:
+        db.close()
+
+
+def _parse_window(window: str) -> float:
+    """Convert a window like `30m`, `24h` or `7d` into seconds."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    unit = window[-1:].lower()
+    if unit not in units:
+        raise ValueError(window)
+    return float(window[:-1]) * units[unit]
+
+
+@app.command("metrics")
+def show_metrics(
+    window: str = typer.Option("24h", "-w", "--window", help="Time window to report, e.g. 30m, 24h, 7d"),
+    command: Optional[str] = typer.Option(None, "-c", "--command", help="Only report this command"),
+) -> None:
+    """Show p50/p95/p99 latency per command from the local metrics history."""
+    try:
+        since = time.time() - _parse_window(window)
+    except ValueError:
+        typer.echo(f"Invalid window: {window} (expected e.g. 30m, 24h, 7d)")
+        raise typer.Exit(code=2)
+    records = (r for r in metrics.read_records(since) if command is None or r.get("cmd") == command)
+    rows = metrics.summarize(records)
+    if not rows:
+        typer.echo(f"No metrics recorded in the last {window} ({metrics.metrics_path()}).")
+        return
+    width = max(len("command"), *(len(r["cmd"]) for r in rows))
+    typer.echo(f"{'command':<{width}}  {'runs':>5}  {'errors':>6}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'avg q':>7}  {'avg tx':>7}  {'openai ms':>9}")
+    for r in rows:
+        typer.echo(
+            f"{r['cmd']:<{width}}  {r['count']:5d}  {r['errors']:6d}  {r['p50']:8.1f}  {r['p95']:8.1f}  "
+            f"{r['p99']:8.1f}  {r['avg_queries']:7.1f}  {r['avg_transactions']:7.1f}  {r['avg_openai_ms']:9.1f}"
+        )
+
+
+@app.command()
+def bench(
+    tasks: int = typer.Option(200, "--tasks", help="Number of synthetic tasks to create"),
+    tags: int = typer.Option(20, "--tags", help="Number of distinct synthetic tags"),
+    tags_per_task: int = typer.Option(2, "--tags-per-task", help="Tags drawn per task"),
+    skew: float = typer.Option(1.0, "--skew", help="Tag popularity skew (0 = uniform, higher = fewer popular tags)"),
+    links_per_task: float = typer.Option(1.0, "--links", help="Average dependency links per task"),
+    workers: int = typer.Option(8, "-w", "--workers", help="Concurrent workers"),
+    duration: float = typer.Option(30.0, "--duration", help="Workload duration in seconds"),
+    write_ratio: float = typer.Option(0.2, "--write-ratio", help="Fraction of operations that write (0-1)"),
+    seed: int = typer.Option(42, "--seed", help="Random seed for the dataset and workload"),
+    keep: bool = typer.Option(False, "--keep", help="Keep the synthetic tasks instead of deleting them afterwards"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Skip confirmation"),
+) -> None:
+    """Generate a synthetic dataset and measure throughput of a mixed workload."""
+    if not yes:
+        confirm = typer.confirm("This writes synthetic tasks to the configured database. Continue?")
+        if not confirm:
+            typer.echo("Aborted.")
+            raise typer.Exit()
+    rng = random.Random(seed)
+    db = _get_db(max_pool_size=max(workers, 1))
+    ids: List[str] = []
+    try:
+        start = time.perf_counter()
+        ids = bench_mod.seed(db, tasks, tags, tags_per_task, skew, links_per_task, rng)
+        typer.echo(f"Seeded {len(ids)} tasks in {time.perf_counter() - start:.1f} s")
+
+        workload = bench_mod.Workload(db, ids, tags, write_ratio, seed)
+        typer.echo(f"Running workload: {workers} worker(s) for {duration:g} s, write ratio {write_ratio:g}")
+        stats = workload.run(workers, duration)
+        ids = workload.ids
+
+        typer.echo(f"{'operation':<14}  {'ops':>7}  {'errors':>6}  {'ops/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}")
+        for name, s in stats.items():
+            typer.echo(
+                f"{name:<14}  {s['count']:7d}  {s['errors']:6d}  {s['ops_per_sec']:8.1f}  "
+                f"{s['p50']:8.1f}  {s['p95']:8.1f}  {s['p99']:8.1f}"
+            )
+    finally:
+        try:
+            if ids and not keep:
+                removed, pruned = bench_mod.cleanup(db, ids, tags)
+                typer.echo(f"Removed {removed} synthetic task(s) and {pruned} unused synthetic tag(s).")
+        finally:
+            db.close()
+
+
+class _BatchRollback(Exception):
+    """Raised inside a transactional batch to roll it back."""
+
+
+def _batch_lines(stream: TextIO) -> Iterator[Tuple[int, str]]:
+    """Yield (line number, command line) pairs, skipping blanks and `#` comments."""
+    for lineno, raw in enumerate(stream, start=1):
+        line = raw.strip()
+        if line and not line.startswith("#"):
+            yield lineno, line
+
+
+def _run_batch_line(line: str) -> int:
+    """Run one command line through the app and return its exit code."""
+    args = shlex.split(line)
+    if args[:1] == ["tasker"]:
+        args = args[1:]
+    if args[:1] in (["batch"], ["--database"], ["--offline"]):
+        typer.echo("Not allowed inside batch: " + args[0])
+        return 2
+    try:
+        result = app(args, prog_name="tasker", standalone_mode=False)
+    except typer.Abort:
+        typer.echo("Aborted.")
+        return 1
+    except typer.Exit as exc:
+        return exc.exit_code
+    except Exception as exc:
+        # usage errors (bad options, unknown command) know how to report themselves
+        if not hasattr(exc, "exit_code") or not hasattr(exc, "show"):
+            raise
+        exc.show()
+        return exc.exit_code
+    return result if isinstance(result, int) else 0
+
+
+@app.command()
+def batch(
+    source: str = typer.Argument(..., help="File with one tasker command per line, or '-' for stdin"),
+    transaction: bool = typer.Option(False, "--transaction", help="Run all commands in one transaction (all-or-nothing)"),
+    stop_on_error: bool = typer.Option(False, "--stop-on-error", help="Stop at the first failing command"),
+) -> None:
+    """Run many tasker commands over a single database connection.
+
+    Each line holds a command as typed after `tasker` (e.g. `add "Buy milk" -t home`).
+    With `--transaction` the first failure rolls back every command and stops the batch.
+    The global `--database` and `--offline` options apply to every command.
+    """
+    global _shared_db, _in_batch
+    if transaction and _offline:
+        typer.echo("--transaction needs a database connection and cannot be used with --offline.")
+        raise typer.Exit(code=2)
+    try:
+        stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    except OSError as exc:
+        typer.echo(f"Cannot read {source}: {exc.strerror or exc}")
+        raise typer.Exit(code=2)
+    # offline commands only append to the queue, so no connection is opened
+    db = None if _offline else _get_db()
+    _shared_db = _BorrowedDB(db) if db is not None else None
+    _in_batch = True
+    ok = failed = 0
+    try:
+        with db.transaction() if transaction else contextlib.nullcontext():
+            for lineno, line in _batch_lines(stream):
+                try:
+                    code = _run_batch_line(line)
+                except Exception as exc:
+                    typer.echo(f"Error: {type(exc).__name__}: {exc}")
+                    code = 1
+                if code == 0:
+                    ok += 1
+                    typer.echo(f"[{lineno}] ok: {line}")
+                    continue
+                failed += 1
+                typer.secho(f"[{lineno}] failed (exit {code}): {line}", fg=typer.colors.RED)
+                if transaction:
+                    raise _BatchRollback()
+                if stop_on_error:
+                    break
+    except _BatchRollback:
+        typer.secho(f"Rolled back {ok} successful command(s).", fg=typer.colors.YELLOW)
+        raise typer.Exit(code=2)
+    finally:
+        _shared_db = None
+        _in_batch = False
+        if stream is not sys.stdin:
+            stream.close()
+        if db is not None:
+            db.close()
+    typer.echo(f"{ok} ok, {failed} failed")
+    if failed:
+        raise typer.Exit(code=2)
+
+
+@app.command("refresh-completion", hidden=True)
+def refresh_completion() -> None:
+    """Rebuild the local task id / tag index used by shell completion."""
+    db = _get_db()
+    try:
+        completion.write_cache(db.list_tasks(), tags=[t["name"] for t in db.list_tags(min_count=0)], database=_database)
+    finally:
+        db.close()
+
+
+@app.command()
+def sync(
+    batch_size: int = typer.Option(500, "--batch-size", help="Queued operations applied per transaction"),
+) -> None:
+    """Upload writes queued with `--offline` to Neo4j."""
+    ops = offline.pending(_database)
+    if not ops:
+        typer.echo("Nothing to sync.")
+        return
+    db = _get_db()
+    synced = 0
+    try:
+        for start in range(0, len(ops), max(batch_size, 1)):
+            chunk = ops[start : start + max(batch_size, 1)]
+            db.apply_ops(chunk)
+            # operations are idempotent, so a crash before this point only means
+            # the chunk is replayed on the next sync
+            offline.drop(len(chunk), _database)
+            synced += len(chunk)
+    finally:
+        db.close()
+        typer.echo(f"Synced {synced} of {len(ops)} queued operation(s).")
+
+
+@app.command("next")
+def next_up(
+    limit: int = typer.Option(10, "-n", "--limit", min=1, help="Number of tasks to show"),
+) -> None:
+    """Show the most urgent open tasks (earliest due date, then priority)."""
+    db = _get_db()
+    try:
+        items = db.next_tasks(limit)
+        if not items:
+            typer.echo("No open tasks.")
+            return
+        for i, t in enumerate(items, start=1):
+            short = t.get("id", "")[:8]
+            tags_out = ",".join(t.get("tags", [])) if t.get("tags") else ""
+            tag_display = f" [{tags_out}]" if tags_out else ""
+            typer.echo(f"{i:2d}. {short} {t.get('title')}{tag_display}{_schedule_display(t)}")
+    finally:
+        db.close()
+
+
+@app.command()
+def retag(
+    old: str = typer.Option(..., "--from", help="Tag to rename", autocompletion=completion.complete_tag),
+    new: str = typer.Option(..., "--to", help="New tag name (merged if it already exists)"),
+    batch_size: int = typer.Option(1000, "--batch-size", min=1, help="Relationships rewired per transaction"),
+) -> None:
+    """Rename a tag on every task."""
+    db = _get_db()
+    try:
+        result = db.retag(old, new, batch_size=batch_size)
+        typer.echo(f"Retagged {result['moved']} task(s) from '{old}' to '{new}'; removed {result['deleted']} tag(s).")
+    finally:
+        db.close()
+
+
+@app.command("merge-tags")
+def merge_tags(
+    sources: List[str] = typer.Argument(..., help="Tags to merge", autocompletion=completion.complete_tag),
+    into: str = typer.Option(..., "--into", help="Tag to merge them into", autocompletion=completion.complete_tag),
+    batch_size: int = typer.Option(1000, "--batch-size", min=1, help="Relationships rewired per transaction"),
+) -> None:
+    """Merge several tags into one, removing the merged tags."""
+    db = _get_db()
+    try:
+        result = db.merge_tags(list(sources), into, batch_size=batch_size)
+        typer.echo(f"Moved {result['moved']} tag assignment(s) into '{into}'; removed {result['deleted']} tag(s).")
+    finally:
+        db.close()
+
+
+@app.command()
+def tree(
+    task: Optional[str] = typer.Argument(None, help="Root task (index, short id, or full id); defaults to all top-level tasks with subtasks", autocompletion=completion.complete_task),
+) -> None:
+    """Show tasks and their subtasks with completion percentages."""
+    db = _get_db()
+    try:
+        root_id = _resolve_task_id(task, db) if task else None
+        rows = db.get_tree(root_id)
+    finally:
+        db.close()
+    if not rows:
+        typer.echo("No subtasks found.")
+        return
+
+    children: dict = {}
+    for r in rows:
+        children.setdefault(r["parent"], []).append(r)
+
+    def _show(node: dict, depth: int) -> None:
+        mark = "✓" if node["done"] else " "
+        progress = ""
+        # progress of a parent is over its subtasks, not counting itself
+        sub_total = node["total"] - 1
+        if sub_total:
+            sub_done = node["done_count"] - (1 if node["done"] else 0)
+            progress = f" ({sub_done}/{sub_total}, {100 * sub_done // sub_total}%)"
+        typer.echo(f"{'  ' * depth}{node['id'][:8]} [{mark}] {node['title']}{progress}")
+        for child in children.get(node["id"], []):
+            _show(child, depth + 1)
+
+    for root in children.get(None, []):
+        _show(root, 0)
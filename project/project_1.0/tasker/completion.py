@@ -0,0 +1,137 @@
+"""Shell completion for task identifiers and tags.
+
+Completers never touch Neo4j: they read a small local index of (task id,
+title) pairs, in `list` order, and tag names, kept per database. When the
+index is older than `TTL_SECONDS` a detached `tasker refresh-completion`
+process rebuilds it in the background, so a Tab press only costs a file read.
+`tasker list` also rewrites the index whenever it fetches every task anyway.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import typer
+
+# Rebuild the index in the background once it is older than this many seconds.
+TTL_SECONDS = 60.0
+# Don't start another background refresh within this many seconds of the last one.
+REFRESH_COOLDOWN = 10.0
+# Length of the id prefix offered as a completion.
+SHORT_ID_LEN = 8
+# Directory holding the `tasker` package, so the background refresh can import it.
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Characters of a database name that are kept in its index file name.
+SAFE_NAME_RE = re.compile(r"[^\w.-]")
+
+
+def database_path(path: str, database: Optional[str]) -> str:
+    """Return the sibling of `path` used for `database`, e.g. `completion-team-a.json`.
+
+    The home database (None) uses `path` itself.
+    """
+    if not database:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{SAFE_NAME_RE.sub('_', database)}{ext}"
+
+
+def cache_path(database: Optional[str] = None) -> str:
+    """Return the index path for `database` (None is the home database).
+
+    The home database uses `TASKER_COMPLETION_CACHE` or `~/.tasker/completion.json`;
+    other databases get a sibling file such as `completion-team-a.json`.
+    """
+    path = os.getenv("TASKER_COMPLETION_CACHE") or os.path.join(os.path.expanduser("~"), ".tasker", "completion.json")
+    return database_path(path, database)
+
+
+def load_cache(database: Optional[str] = None) -> Dict:
+    """Return the cached index, or an empty one if missing or unreadable."""
+    try:
+        with open(cache_path(database), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"updated": 0, "tasks": [], "tags": []}
+
+
+def write_cache(tasks: Iterable[Dict], tags: Iterable[str] | None = None, database: Optional[str] = None) -> None:
+    """Atomically write the index from task dicts (as returned by `TaskDB.list_tasks`).
+
+    If `tags` is not given, the tags used by `tasks` are indexed.
+    """
+    task_list = list(tasks)
+    if tags is None:
+        tags = {tag for t in task_list for tag in t.get("tags") or []}
+    data = {
+        "updated": time.time(),
+        "tasks": [[t.get("id") or "", t.get("title") or ""] for t in task_list],
+        "tags": sorted(set(tags)),
+    }
+    path = cache_path(database)
+    parent = os.path.dirname(path) or "."
+    try:
+        os.makedirs(parent, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix="completion-", dir=parent)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def refresh_in_background(database: Optional[str] = None) -> None:
+    """Start a detached `tasker refresh-completion` unless one started recently."""
+    marker = cache_path(database) + ".refresh"
+    try:
+        if time.time() - os.path.getmtime(marker) < REFRESH_COOLDOWN:
+            return
+    except OSError:
+        pass
+    try:
+        os.makedirs(os.path.dirname(marker) or ".", exist_ok=True)
+        with open(marker, "w", encoding="utf-8"):
+            pass
+        command = [sys.executable, "-m", "tasker"]
+        if database:
+            command += ["--database", database]
+        # the shell may run completion from any directory; make sure the package
+        # that is running now is the one the child imports
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (PACKAGE_ROOT, env.get("PYTHONPATH")) if p)
+        subprocess.Popen(
+            command + ["refresh-completion"],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        pass
+
+
+def _cached(ctx: typer.Context) -> Dict:
+    """Load the index of the database selected on the command line (or by
+    `NEO4J_DATABASE`) and schedule a background refresh if it is stale."""
+    database = ctx.find_root().params.get("database") or os.getenv("NEO4J_DATABASE") or None
+    data = load_cache(database)
+    if time.time() - data.get("updated", 0) > TTL_SECONDS:
+        refresh_in_background(database)
+    return data
+
+
+def complete_task(ctx: typer.Context, incomplete: str) -> List[Tuple[str, str]]:
+    """Typer completer for task identifiers: short ids with titles as help text."""
+    return [(tid[:SHORT_ID_LEN], title) for tid, title in _cached(ctx).get("tasks", []) if tid.startswith(incomplete)]
+
+
+def complete_tag(ctx: typer.Context, incomplete: str) -> List[str]:
+    """Typer completer for tag names."""
+    return [tag for tag in _cached(ctx).get("tags", []) if tag.startswith(incomplete)]
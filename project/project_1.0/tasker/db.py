@@ -1,42 +1,305 @@
 """Neo4j database helper for Tasker.
 
 Provides a small `TaskDB` class wrapping the neo4j driver for simple CRUD.
+
+All queries run inside managed transactions (`execute_read` / `execute_write`)
+so the driver retries them on transient errors and leader switches, and reads
+can be routed to followers or read replicas in a cluster. Transaction functions
+may therefore run more than once and must only touch the database through the
+transaction they are given.
 """
 from __future__ import annotations
 
-from typing import Dict, List, Optional
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+import time
 import uuid
-from neo4j import GraphDatabase, Driver
+import warnings
+
+if TYPE_CHECKING:
+    from neo4j import Driver, ManagedTransaction, Transaction
+
+from . import metrics
+
+T = TypeVar("T")
+
+# Default time budget (seconds) the driver spends retrying a transaction.
+DEFAULT_MAX_RETRY_TIME = 30.0
+
+TASK_WITH_TAGS_QUERY = (
+    "MATCH (t:Task {id:$id}) OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) "
+    "RETURN t, collect(DISTINCT g.name) AS tags"
+)
+
+# Fixed-shape update used by `TaskDB.update_task`. Null parameters keep the
+# current value; a null `$tags` leaves tags alone, a list is applied as a diff.
+UPDATE_TASK_QUERY = (
+    "MATCH (t:Task {id:$id}) "
+    "SET t.title = coalesce($title, t.title), "
+    "t.description = coalesce($description, t.description), "
+    "t.due = coalesce(date($due), t.due), "
+    "t.priority = coalesce($priority, t.priority) "
+    "WITH t "
+    "CALL { WITH t "
+    "MATCH (t)-[r:HAS_TAG]->(g:Tag) WHERE $tags IS NOT NULL AND NOT g.name IN $tags "
+    "DELETE r } "
+    "CALL { WITH t "
+    "UNWIND coalesce($tags, []) AS tagName "
+    "MERGE (g:Tag {name:tagName}) "
+    "MERGE (t)-[:HAS_TAG]->(g) } "
+    "WITH t "
+    "OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) "
+    "RETURN t, collect(DISTINCT g.name) AS tags"
+)
+
+# Batched, idempotent statements used by `TaskDB.apply_ops` to replay queued
+# offline writes; each receives `$ops`, a list of operation dicts of one kind.
+APPLY_OPS_QUERIES = {
+    "add": (
+        "UNWIND $ops AS op "
+        "MERGE (t:Task {id:op.id}) "
+        "ON CREATE SET t.title = op.title, t.description = op.description, t.done = false, "
+        "t.created = datetime(op.created), t.due = date(op.due), t.priority = op.priority "
+        "WITH t, op "
+        "CALL { WITH t, op MATCH (p:Task {id:op.parent}) MERGE (p)-[:HAS_SUBTASK]->(t) } "
+        "WITH t, op UNWIND op.tags AS tagName "
+        "MERGE (g:Tag {name:tagName}) "
+        "MERGE (t)-[:HAS_TAG]->(g)"
+    ),
+    "complete": "UNWIND $ops AS op MATCH (t:Task {id:op.id}) SET t.done = true",
+    "edit": (
+        "UNWIND $ops AS op "
+        "MATCH (t:Task {id:op.id}) "
+        "SET t.title = coalesce(op.title, t.title), "
+        "t.description = coalesce(op.description, t.description), "
+        "t.due = coalesce(date(op.due), t.due), "
+        "t.priority = coalesce(op.priority, t.priority) "
+        "WITH t, op "
+        "CALL { WITH t, op "
+        "MATCH (t)-[r:HAS_TAG]->(g:Tag) WHERE op.tags IS NOT NULL AND NOT g.name IN op.tags "
+        "DELETE r } "
+        "CALL { WITH t, op "
+        "UNWIND coalesce(op.tags, []) AS tagName "
+        "MERGE (g:Tag {name:tagName}) "
+        "MERGE (t)-[:HAS_TAG]->(g) }"
+    ),
+    "link": (
+        "UNWIND $ops AS op "
+        "MATCH (a:Task {id:op.source}), (b:Task {id:op.target}) "
+        "MERGE (a)-[:LINK {kind:op.kind}]->(b)"
+    ),
+    "delete": "UNWIND $ops AS op MATCH (t:Task {id:op.id}) DETACH DELETE t",
+}
+
+
+class _CountingTx:
+    """Transaction wrapper that counts the statements run through it in the metrics."""
+
+    def __init__(self, tx: Any):
+        self._tx = tx
+
+    def run(self, query: Any, *args: Any, **kwargs: Any) -> Any:
+        metrics.count_query()
+        return self._tx.run(query, *args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._tx, name)
+
+
+def _counted(work: Callable[..., T]) -> Callable[..., T]:
+    """Wrap a transaction function so its statements are counted."""
+    return lambda tx, *args, **kwargs: work(_CountingTx(tx), *args, **kwargs)
+
+
+def _task_props(node: Any, tags: Optional[List[str]] = None) -> Dict:
+    """Convert a Task node into a plain dict with string `created`/`due` values."""
+    props = dict(node)
+    for key in ("created", "due"):
+        if key in props:
+            props[key] = str(props[key])
+    if tags is not None:
+        props["tags"] = tags or []
+    return props
+
+
+def _fetch_task(tx: ManagedTransaction, task_id: str) -> Optional[Dict]:
+    """Return a task with its tags inside an open transaction, or None."""
+    rec = tx.run(TASK_WITH_TAGS_QUERY, id=task_id).single()
+    if not rec:
+        return None
+    return _task_props(rec["t"], rec.get("tags"))
 
 
 class TaskDB:
     """Simple wrapper around a Neo4j driver for Task nodes.
 
     Each task node has properties: `id`, `title`, `description`, `done`, `created`.
+
+    `max_retry_time` is the number of seconds the driver keeps retrying a
+    transaction that failed with a transient error before giving up.
+
+    `database` names the Neo4j database every session targets. Naming it
+    skips the home-database lookup the driver otherwise performs, and lets
+    separate stores live side by side; `None` uses the user's home database.
+
+    The remaining keyword arguments tune the connection pool; `None` keeps the
+    driver default:
+
+    - `max_pool_size`: maximum connections kept per server.
+    - `acquisition_timeout`: seconds to wait for a free pooled connection.
+    - `connection_timeout`: seconds to wait when opening a new connection.
+    - `fetch_size`: records pulled per batch when streaming results.
+    - `keep_alive`: enable TCP keep-alive on pooled connections.
     """
 
-    def __init__(self, uri: str, user: str, password: str):
-        self._driver: Driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(
+        self,
+        uri: str,
+        user: str,
+        password: str,
+        max_retry_time: float = DEFAULT_MAX_RETRY_TIME,
+        database: Optional[str] = None,
+        max_pool_size: Optional[int] = None,
+        acquisition_timeout: Optional[float] = None,
+        connection_timeout: Optional[float] = None,
+        fetch_size: Optional[int] = None,
+        keep_alive: Optional[bool] = None,
+    ):
+        self._database = database
+        # Explicit transaction opened by `transaction()`, shared by all calls while set.
+        self._tx: Optional[Transaction] = None
+        options = {
+            "max_connection_pool_size": max_pool_size,
+            "connection_acquisition_timeout": acquisition_timeout,
+            "connection_timeout": connection_timeout,
+            "fetch_size": fetch_size,
+            "keep_alive": keep_alive,
+        }
+        # imported here so commands that never connect (e.g. shell completion)
+        # don't pay for loading the driver package
+        from neo4j import GraphDatabase
+
+        self._driver: Driver = GraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_transaction_retry_time=max_retry_time,
+            **{k: v for k, v in options.items() if v is not None},
+        )
+
+    def warm_up(self, connections: int = 1) -> None:
+        """Verify connectivity and open `connections` pooled connections up front.
+
+        Each connection is held by its own open transaction until all of them
+        exist, so they end up idle in the pool instead of being opened lazily
+        by the first concurrent requests.
+        """
+        self._verify_connectivity()
+        sessions = []
+        try:
+            for _ in range(max(connections, 0)):
+                session = self._driver.session(database=self._database)
+                sessions.append(session)
+                tx = session.begin_transaction()
+                tx.run("RETURN 1").consume()
+        finally:
+            for session in sessions:
+                session.close()
+
+    def _verify_connectivity(self) -> None:
+        """Check that the driver can reach the target database."""
+        if self._database is None:
+            self._driver.verify_connectivity()
+            return
+        with warnings.catch_warnings():
+            # naming the database is a driver preview feature and warns about it
+            warnings.filterwarnings("ignore", message=".*verify_connectivity.*preview")
+            self._driver.verify_connectivity(database=self._database)
+
+    def ping(self) -> Tuple[float, float]:
+        """Time connecting to the database and a trivial query.
+
+        Returns (connect_ms, query_ms). Raises the driver's exception if either
+        step fails, or RuntimeError if the query returns something unexpected.
+        """
+        start = time.perf_counter()
+        self._verify_connectivity()
+        connect_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        row = self._read(lambda tx: tx.run("RETURN 1 AS v").single())
+        query_ms = (time.perf_counter() - start) * 1000
+        if not row or row.get("v") != 1:
+            raise RuntimeError("unexpected result")
+        return connect_ms, query_ms
 
     def close(self) -> None:
         """Close the underlying Neo4j driver."""
         self._driver.close()
 
-    def create_task(self, title: str, description: str = "", tags: Optional[List[str]] = None) -> Dict:
-        """Create a new task and return its properties."""
+    @contextmanager
+    def transaction(self) -> Iterator["TaskDB"]:
+        """Run every TaskDB call made inside the block in one explicit transaction.
+
+        The transaction commits when the block exits normally and rolls back if
+        it raises. Unlike managed transactions it is not retried by the driver.
+        """
+        if self._tx is not None:
+            raise RuntimeError("a transaction is already open on this TaskDB")
+        metrics.count_transaction()
+        with self._driver.session(database=self._database) as session, session.begin_transaction() as tx:
+            self._tx = _CountingTx(tx)
+            try:
+                yield self
+            finally:
+                self._tx = None
+
+    def _read(self, work: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run `work(tx, *args, **kwargs)` in a retried read transaction."""
+        if self._tx is not None:
+            return work(self._tx, *args, **kwargs)
+        metrics.count_transaction()
+        with self._driver.session(database=self._database) as session:
+            return session.execute_read(_counted(work), *args, **kwargs)
+
+    def _write(self, work: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run `work(tx, *args, **kwargs)` in a retried write transaction."""
+        if self._tx is not None:
+            return work(self._tx, *args, **kwargs)
+        metrics.count_transaction()
+        with self._driver.session(database=self._database) as session:
+            return session.execute_write(_counted(work), *args, **kwargs)
+
+    def create_task(
+        self,
+        title: str,
+        description: str = "",
+        tags: Optional[List[str]] = None,
+        due: Optional[str] = None,
+        priority: Optional[int] = None,
+        parent_id: Optional[str] = None,
+    ) -> Dict:
+        """Create a new task and return its properties.
+
+        `due` is an ISO date (`YYYY-MM-DD`) stored as a Neo4j date; `priority`
+        runs from 1 (most urgent) upwards. With `parent_id` the task becomes a
+        subtask: `(parent)-[:HAS_SUBTASK]->(task)`. All three are optional.
+        """
         task_id = str(uuid.uuid4())
         tags_list = tags or []
-        with self._driver.session() as session:
-            # create task node
-            session.run(
-                "CREATE (t:Task {id:$id, title:$title, description:$description, done:false, created:datetime()})",
+
+        def work(tx: ManagedTransaction) -> Dict:
+            # create task node (null due/priority are simply not stored)
+            tx.run(
+                "CREATE (t:Task {id:$id, title:$title, description:$description, done:false, created:datetime(), "
+                "due:date($due), priority:$priority})",
                 id=task_id,
                 title=title,
                 description=description,
+                due=due,
+                priority=priority,
             )
             # create/attach tags as Tag nodes
             if tags_list:
-                session.run(
+                tx.run(
                     "UNWIND $tags AS tagName "
                     "MERGE (g:Tag {name:tagName}) "
                     "WITH g "
@@ -45,17 +308,16 @@ class TaskDB:
                     id=task_id,
                     tags=tags_list,
                 )
+            if parent_id:
+                tx.run(
+                    "MATCH (p:Task {id:$parent}), (t:Task {id:$id}) MERGE (p)-[:HAS_SUBTASK]->(t)",
+                    id=task_id,
+                    parent=parent_id,
+                )
             # return task with collected tags
-            rec = session.run(
-                "MATCH (t:Task {id:$id}) OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) RETURN t, collect(DISTINCT g.name) AS tags",
-                id=task_id,
-            ).single()
-            node = rec["t"]
-            props = dict(node)
-            props["tags"] = rec["tags"] or []
-            if "created" in props:
-                props["created"] = str(props["created"])
-            return props
+            return _fetch_task(tx, task_id)
+
+        return self._write(work)
 
     def list_tasks(self, only_done: Optional[bool] = None, tag: Optional[str] = None) -> List[Dict]:
         """List tasks.
@@ -63,169 +325,196 @@ class TaskDB:
         If `only_done` is True/False filter by `done`, otherwise return all.
         If `tag` is provided, only return tasks that include the tag in their `tags` list.
         """
-        params = {}
-        where_clauses: list[str] = []
-        if only_done is not None:
-            where_clauses.append("t.done = $done")
-            params["done"] = only_done
-        if tag:
-            where_clauses.append("$tag IN t.tags")
-            params["tag"] = tag
-
-        tasks: List[Dict] = []
-        with self._driver.session() as session:
+
+        def work(tx: ManagedTransaction) -> List[Dict]:
             if tag:
                 # filter by Tag nodes
-                result = session.run(
+                result = tx.run(
                     "MATCH (t:Task)-[:HAS_TAG]->(g:Tag {name:$tag}) OPTIONAL MATCH (t)-[:HAS_TAG]->(tg:Tag) "
                     "RETURN t, collect(DISTINCT tg.name) AS tags ORDER BY t.created DESC",
                     tag=tag,
                 )
+            elif only_done is None:
+                result = tx.run(
+                    "MATCH (t:Task) OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) RETURN t, collect(DISTINCT g.name) AS tags ORDER BY t.created DESC"
+                )
             else:
-                # apply done filter if present
-                if only_done is None:
-                    result = session.run(
-                        "MATCH (t:Task) OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) RETURN t, collect(DISTINCT g.name) AS tags ORDER BY t.created DESC"
-                    )
-                else:
-                    result = session.run(
-                        "MATCH (t:Task) WHERE t.done = $done OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) RETURN t, collect(DISTINCT g.name) AS tags ORDER BY t.created DESC",
-                        done=only_done,
-                    )
-
-            for r in result:
-                node = r["t"]
-                props = dict(node)
-                # Ensure created is JSON-serializable string
-                if "created" in props:
-                    props["created"] = str(props["created"])
-                props["tags"] = r.get("tags") or []
-                tasks.append(props)
-        return tasks
+                # apply done filter
+                result = tx.run(
+                    "MATCH (t:Task) WHERE t.done = $done OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) RETURN t, collect(DISTINCT g.name) AS tags ORDER BY t.created DESC",
+                    done=only_done,
+                )
+            return [_task_props(r["t"], r.get("tags")) for r in result]
+
+        return self._read(work)
+
+    def next_tasks(self, limit: int = 10) -> List[Dict]:
+        """Return up to `limit` open tasks, most urgent first.
+
+        Tasks with a due date come first (earliest due, then priority), then
+        undated tasks by priority, then the remaining open tasks oldest first.
+        The first two queries filter and sort on the leading properties of the
+        composite indexes created by `create_constraints`, so the server reads
+        only about `limit` index entries instead of sorting every open task.
+        The last one is only run when those do not fill `limit`.
+        """
+        dated = (
+            "MATCH (t:Task) WHERE t.done = false AND t.due IS NOT NULL "
+            "WITH t ORDER BY t.done, t.due, t.priority LIMIT $limit "
+            "OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) "
+            "RETURN t, collect(DISTINCT g.name) AS tags ORDER BY t.due, t.priority"
+        )
+        undated = (
+            "MATCH (t:Task) WHERE t.done = false AND t.priority IS NOT NULL AND t.due IS NULL "
+            "WITH t ORDER BY t.done, t.priority LIMIT $limit "
+            "OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) "
+            "RETURN t, collect(DISTINCT g.name) AS tags ORDER BY t.priority"
+        )
+        rest = (
+            "MATCH (t:Task) WHERE t.done = false AND t.priority IS NULL AND t.due IS NULL "
+            "WITH t ORDER BY t.created LIMIT $limit "
+            "OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) "
+            "RETURN t, collect(DISTINCT g.name) AS tags ORDER BY t.created"
+        )
+
+        def work(tx: ManagedTransaction) -> List[Dict]:
+            tasks: List[Dict] = []
+            for query in (dated, undated, rest):
+                if len(tasks) >= limit:
+                    break
+                tasks += [_task_props(r["t"], r.get("tags")) for r in tx.run(query, limit=limit - len(tasks))]
+            return tasks
+
+        return self._read(work)
 
     def complete_task(self, task_id: str) -> Optional[Dict]:
         """Mark a task done and return the updated properties, or None if not found."""
-        query = "MATCH (t:Task {id:$id}) SET t.done = true RETURN t"
-        with self._driver.session() as session:
-            rec = session.run(query, id=task_id).single()
+
+        def work(tx: ManagedTransaction) -> Optional[Dict]:
+            rec = tx.run("MATCH (t:Task {id:$id}) SET t.done = true RETURN t", id=task_id).single()
             if not rec:
                 return None
-            node = rec["t"]
-            return dict(node)
+            return dict(rec["t"])
+
+        return self._write(work)
 
     def get_task(self, task_id: str) -> Optional[Dict]:
         """Return properties for a single task by id, or None if not found."""
-        query = "MATCH (t:Task {id:$id}) OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) RETURN t, collect(DISTINCT g.name) AS tags"
-        with self._driver.session() as session:
-            rec = session.run(query, id=task_id).single()
-            if not rec:
-                return None
-            node = rec["t"]
-            props = dict(node)
-            props["tags"] = rec.get("tags") or []
-            if "created" in props:
-                props["created"] = str(props["created"])
-            return props
+        return self._read(_fetch_task, task_id)
 
     def delete_task(self, task_id: str) -> bool:
         """Delete a task by id; returns True (always) for now."""
-        query = "MATCH (t:Task {id:$id}) DETACH DELETE t"
-        with self._driver.session() as session:
-            session.run(query, id=task_id)
+
+        def work(tx: ManagedTransaction) -> None:
+            tx.run("MATCH (t:Task {id:$id}) DETACH DELETE t", id=task_id).consume()
+
+        self._write(work)
         return True
 
-    def update_task(self, task_id: str, title: Optional[str] = None, description: Optional[str] = None, tags: Optional[List[str]] = None) -> Optional[Dict]:
-        """Update task properties; if `tags` is provided, replace tag relations."""
-        sets = []
-        params = {"id": task_id}
-        if title is not None:
-            sets.append("t.title = $title")
-            params["title"] = title
-        if description is not None:
-            sets.append("t.description = $description")
-            params["description"] = description
-
-        with self._driver.session() as session:
-            if sets:
-                set_clause = ", ".join(sets)
-                session.run(f"MATCH (t:Task {{id:$id}}) SET {set_clause}", **params)
-
-            if tags is not None:
-                # remove existing tag relationships
-                session.run("MATCH (t:Task {id:$id})-[r:HAS_TAG]->() DELETE r", id=task_id)
-                if tags:
-                    session.run(
-                        "UNWIND $tags AS tagName MERGE (g:Tag {name:tagName}) WITH g MATCH (t:Task {id:$id}) MERGE (t)-[:HAS_TAG]->(g)",
-                        id=task_id,
-                        tags=tags,
-                    )
-
-            # return updated task
-            rec = session.run("MATCH (t:Task {id:$id}) OPTIONAL MATCH (t)-[:HAS_TAG]->(g:Tag) RETURN t, collect(DISTINCT g.name) AS tags", id=task_id).single()
+    def update_task(
+        self,
+        task_id: str,
+        title: Optional[str] = None,
+        description: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        due: Optional[str] = None,
+        priority: Optional[int] = None,
+    ) -> Optional[Dict]:
+        """Update task properties; if `tags` is provided, replace tag relations.
+
+        Runs one fixed statement whatever combination of fields is given, so the
+        server reuses a single cached plan. `None` leaves a field unchanged.
+        Tags are diffed: only stale HAS_TAG relationships are deleted and only
+        missing ones are created.
+        """
+
+        def work(tx: ManagedTransaction) -> Optional[Dict]:
+            rec = tx.run(
+                UPDATE_TASK_QUERY,
+                id=task_id,
+                title=title,
+                description=description,
+                tags=list(dict.fromkeys(tags)) if tags is not None else None,
+                due=due,
+                priority=priority,
+            ).single()
             if not rec:
                 return None
-            node = rec["t"]
-            props = dict(node)
-            props["tags"] = rec.get("tags") or []
-            if "created" in props:
-                props["created"] = str(props["created"])
-            return props
+            return _task_props(rec["t"], rec.get("tags"))
+
+        return self._write(work)
 
     def create_constraints(self) -> None:
-        """Create helpful constraints for Task and Tag nodes (if not exists)."""
-        with self._driver.session() as session:
+        """Create helpful constraints and indexes for Task and Tag nodes (if not exists)."""
+        # Schema commands cannot share a transaction with each other, so each
+        # constraint gets its own managed write.
+        for query in (
             # Unique constraint for Task.id
-            session.run(
-                "CREATE CONSTRAINT IF NOT EXISTS FOR (t:Task) REQUIRE (t.id) IS UNIQUE"
-            )
+            "CREATE CONSTRAINT IF NOT EXISTS FOR (t:Task) REQUIRE (t.id) IS UNIQUE",
             # Unique constraint for Tag.name
-            session.run(
-                "CREATE CONSTRAINT IF NOT EXISTS FOR (g:Tag) REQUIRE (g.name) IS UNIQUE"
-            )
+            "CREATE CONSTRAINT IF NOT EXISTS FOR (g:Tag) REQUIRE (g.name) IS UNIQUE",
+            # Composite indexes backing `next_tasks` (ORDER BY ... LIMIT served from the index)
+            # (done, due) rather than (done, due, priority): composite entries need every
+            # property set, so a longer key would leave dated tasks without priority out
+            # (task_open_due had that longer key and is replaced)
+            "DROP INDEX task_open_due IF EXISTS",
+            "CREATE INDEX task_open_due_date IF NOT EXISTS FOR (t:Task) ON (t.done, t.due)",
+            "CREATE INDEX task_open_priority IF NOT EXISTS FOR (t:Task) ON (t.done, t.priority)",
+        ):
+            self._write(lambda tx, q=query: tx.run(q).consume())
 
     def migrate_tags_to_nodes(self) -> int:
         """Migrate tasks that have a `tags` property (list) into `:Tag` nodes and `HAS_TAG` rels.
 
         Returns the number of tasks migrated.
         """
-        with self._driver.session() as session:
+
+        def work(tx: ManagedTransaction) -> int:
             # find tasks with tags property
-            rec = session.run("MATCH (t:Task) WHERE exists(t.tags) RETURN t.id AS id, t.tags AS tags").data()
+            rec = tx.run("MATCH (t:Task) WHERE t.tags IS NOT NULL RETURN t.id AS id, t.tags AS tags").data()
             count = 0
             for row in rec:
                 tid = row["id"]
                 tags = row.get("tags") or []
                 if not tags:
                     # remove empty property
-                    session.run("MATCH (t:Task {id:$id}) REMOVE t.tags", id=tid)
+                    tx.run("MATCH (t:Task {id:$id}) REMOVE t.tags", id=tid)
                     continue
-                session.run(
+                tx.run(
                     "UNWIND $tags AS tagName MERGE (g:Tag {name:tagName}) WITH g MATCH (t:Task {id:$id}) MERGE (t)-[:HAS_TAG]->(g)",
                     id=tid,
                     tags=tags,
                 )
-                session.run("MATCH (t:Task {id:$id}) REMOVE t.tags", id=tid)
+                tx.run("MATCH (t:Task {id:$id}) REMOVE t.tags", id=tid)
                 count += 1
             return count
 
+        return self._write(work)
+
     def delete_all_tasks(self) -> int:
         """Delete all Task nodes and return the number deleted."""
-        with self._driver.session() as session:
-            rec = session.run("MATCH (t:Task) RETURN count(t) AS c").single()
+
+        def work(tx: ManagedTransaction) -> int:
+            rec = tx.run("MATCH (t:Task) RETURN count(t) AS c").single()
             count = int(rec["c"]) if rec and rec["c"] is not None else 0
             if count:
-                session.run("MATCH (t:Task) DETACH DELETE t")
+                tx.run("MATCH (t:Task) DETACH DELETE t")
             return count
 
+        return self._write(work)
+
     def delete_completed_tasks(self) -> int:
         """Delete all tasks where `done` is true and return the number deleted."""
-        with self._driver.session() as session:
-            rec = session.run("MATCH (t:Task {done:true}) RETURN count(t) AS c").single()
+
+        def work(tx: ManagedTransaction) -> int:
+            rec = tx.run("MATCH (t:Task {done:true}) RETURN count(t) AS c").single()
             count = int(rec["c"]) if rec and rec["c"] is not None else 0
             if count:
-                session.run("MATCH (t:Task {done:true}) DETACH DELETE t")
+                tx.run("MATCH (t:Task {done:true}) DETACH DELETE t")
             return count
 
+        return self._write(work)
+
     # -- Linking tasks -------------------------------------------------
     def create_link(self, source_id: str, target_id: str, kind: str = "depends") -> bool:
         """Create a LINK relationship from source -> target with a `kind` property.
@@ -238,9 +527,8 @@ class TaskDB:
             "MATCH (a:Task {id:$a}), (b:Task {id:$b}) "
             "MERGE (a)-[r:LINK {kind:$kind}]->(b) RETURN count(r) AS c"
         )
-        with self._driver.session() as session:
-            rec = session.run(query, a=source_id, b=target_id, kind=kind).single()
-            return True
+        self._write(lambda tx: tx.run(query, a=source_id, b=target_id, kind=kind).consume())
+        return True
 
     def delete_link(self, source_id: str, target_id: str, kind: str = "depends") -> int:
         """Delete LINK relationships of given kind from source -> target.
@@ -251,38 +539,171 @@ class TaskDB:
             "MATCH (a:Task {id:$a})-[r:LINK {kind:$kind}]->(b:Task {id:$b}) "
             "WITH r, count(r) AS c DELETE r RETURN c"
         )
-        with self._driver.session() as session:
-            rec = session.run(query, a=source_id, b=target_id, kind=kind).single()
+
+        def work(tx: ManagedTransaction) -> int:
+            rec = tx.run(query, a=source_id, b=target_id, kind=kind).single()
             return int(rec["c"]) if rec and rec["c"] is not None else 0
 
+        return self._write(work)
+
     def get_links(self, task_id: str) -> List[Dict]:
         """Return linked tasks for a given task id.
 
         Returns a list of dictionaries with keys: `direction` ("out"|"in"),
         `kind`, and `task` (the linked task properties).
         """
-        links: List[Dict] = []
-        with self._driver.session() as session:
+
+        def work(tx: ManagedTransaction) -> List[Dict]:
+            links: List[Dict] = []
             # outgoing
             q1 = "MATCH (t:Task {id:$id})-[r:LINK]->(o:Task) RETURN r.kind AS kind, o"
-            for rec in session.run(q1, id=task_id):
-                node = rec["o"]
-                props = dict(node)
-                if "created" in props:
-                    props["created"] = str(props["created"])
-                if "tags" in props and props["tags"] is None:
-                    props["tags"] = []
-                links.append({"direction": "out", "kind": rec.get("kind"), "task": props})
-
             # incoming
             q2 = "MATCH (o:Task)-[r:LINK]->(t:Task {id:$id}) RETURN r.kind AS kind, o"
-            for rec in session.run(q2, id=task_id):
-                node = rec["o"]
-                props = dict(node)
-                if "created" in props:
-                    props["created"] = str(props["created"])
-                if "tags" in props and props["tags"] is None:
-                    props["tags"] = []
-                links.append({"direction": "in", "kind": rec.get("kind"), "task": props})
-
-        return links
+            for direction, query in (("out", q1), ("in", q2)):
+                for rec in tx.run(query, id=task_id):
+                    props = _task_props(rec["o"])
+                    if "tags" in props and props["tags"] is None:
+                        props["tags"] = []
+                    links.append({"direction": direction, "kind": rec.get("kind"), "task": props})
+            return links
+
+        return self._read(work)
+
+    def get_tree(self, root_id: Optional[str] = None) -> List[Dict]:
+        """Return the subtask hierarchy with completion counts, in one traversal.
+
+        Walks `HAS_SUBTASK*0..` once from the root task (or from every
+        top-level task that has subtasks) and aggregates on the server: each
+        path contributes its end node to the subtree of every node on it.
+        Returns one dict per node with `id`, `title`, `done`, `created`,
+        `parent` (None for roots), `depth`, `total` (subtree size including
+        the node itself) and `done_count` (completed nodes in that subtree).
+        """
+        query = (
+            "MATCH p = (root:Task)-[:HAS_SUBTASK*0..]->(n:Task) "
+            "WHERE ($root IS NULL AND NOT EXISTS { ()-[:HAS_SUBTASK]->(root) } "
+            "AND EXISTS { (root)-[:HAS_SUBTASK]->() }) OR root.id = $root "
+            "WITH n, nodes(p) AS ns "
+            "UNWIND range(0, size(ns) - 1) AS i "
+            "WITH ns[i] AS anc, n, "
+            "CASE WHEN i = size(ns) - 1 AND i > 0 THEN ns[i - 1].id END AS parent, "
+            "CASE WHEN i = size(ns) - 1 THEN i END AS depth "
+            "WITH anc, collect(DISTINCT n) AS subtree, head(collect(parent)) AS parent, min(depth) AS depth "
+            "RETURN anc.id AS id, anc.title AS title, anc.done AS done, toString(anc.created) AS created, "
+            "parent, depth, size(subtree) AS total, size([x IN subtree WHERE x.done]) AS done_count "
+            "ORDER BY depth, created"
+        )
+        return self._read(lambda tx: tx.run(query, root=root_id).data())
+
+    def get_link_graph(self, kind: Optional[str] = "depends") -> Dict[str, List[Dict]]:
+        """Fetch the LINK subgraph in a single query for in-memory analysis.
+
+        Returns a dict with `tasks` (each with `id`, `title`, `done`) and `links`
+        (each with `source`, `target`, `kind`). Pass `kind=None` to include links
+        of every kind.
+        """
+        query = (
+            "MATCH (a:Task)-[r:LINK]->(b:Task) "
+            "WHERE $kind IS NULL OR r.kind = $kind "
+            "RETURN a.id AS source, a.title AS source_title, a.done AS source_done, "
+            "b.id AS target, b.title AS target_title, b.done AS target_done, r.kind AS kind"
+        )
+
+        def work(tx: ManagedTransaction) -> Dict[str, List[Dict]]:
+            tasks: Dict[str, Dict] = {}
+            links: List[Dict] = []
+            for rec in tx.run(query, kind=kind):
+                for side in ("source", "target"):
+                    tid = rec[side]
+                    if tid not in tasks:
+                        tasks[tid] = {"id": tid, "title": rec[f"{side}_title"], "done": bool(rec[f"{side}_done"])}
+                links.append({"source": rec["source"], "target": rec["target"], "kind": rec["kind"]})
+            return {"tasks": list(tasks.values()), "links": links}
+
+        return self._read(work)
+
+    def merge_tags(self, sources: List[str], into: str, batch_size: int = 1000) -> Dict[str, int]:
+        """Move every HAS_TAG relationship from the `sources` tags onto `into`.
+
+        The rewiring happens on the server in batches of `batch_size`
+        relationships, one write transaction each, so large tags don't build a
+        single huge transaction. Source tags left without relationships are
+        deleted afterwards. Returns `moved` (relationships rewired) and
+        `deleted` (tag nodes removed).
+        """
+        move = (
+            "MATCH (t:Task)-[r:HAS_TAG]->(src:Tag) WHERE src.name IN $sources AND src.name <> $into "
+            "WITH t, r LIMIT $batch "
+            "MERGE (dst:Tag {name:$into}) "
+            "MERGE (t)-[:HAS_TAG]->(dst) "
+            "DELETE r "
+            "RETURN count(*) AS moved"
+        )
+        prune = (
+            "MATCH (g:Tag) WHERE g.name IN $sources AND g.name <> $into AND NOT EXISTS { (g)--() } "
+            "DELETE g RETURN count(*) AS deleted"
+        )
+        moved = 0
+        while True:
+            batch = self._write(lambda tx: tx.run(move, sources=sources, into=into, batch=batch_size).single()["moved"])
+            moved += batch
+            if batch < batch_size:
+                break
+        deleted = self._write(lambda tx: tx.run(prune, sources=sources, into=into).single()["deleted"])
+        return {"moved": moved, "deleted": deleted}
+
+    def delete_unused_tags(self, names: List[str]) -> int:
+        """Delete the tags in `names` that no task uses any more and return how many were removed."""
+        prune = "MATCH (g:Tag) WHERE g.name IN $names AND NOT EXISTS { (g)--() } DELETE g RETURN count(*) AS deleted"
+        return self._write(lambda tx: tx.run(prune, names=names).single()["deleted"])
+
+    def retag(self, old: str, new: str, batch_size: int = 1000) -> Dict[str, int]:
+        """Rename tag `old` to `new` on every task (merging if `new` exists); see `merge_tags`."""
+        return self.merge_tags([old], new, batch_size=batch_size)
+
+    def list_tags(self, min_count: int = 1, sort: str = "count", prefix: Optional[str] = None) -> List[Dict]:
+        """Return `:Tag` nodes with their task usage counts.
+
+        Each dict has `name`, `total`, `open`, and `done`. `total` comes from the
+        node's HAS_TAG relationship degree, so counting does not touch Task nodes;
+        only the `done` split expands the relationships. `sort` is "count"
+        (most used first) or "name".
+        """
+        order = "name ASC" if sort == "name" else "total DESC, name ASC"
+        query = (
+            "MATCH (g:Tag) WHERE $prefix IS NULL OR g.name STARTS WITH $prefix "
+            "WITH g, COUNT { (g)<-[:HAS_TAG]-() } AS total WHERE total >= $min_count "
+            "RETURN g.name AS name, total, COUNT { (g)<-[:HAS_TAG]-(:Task {done:true}) } AS done "
+            f"ORDER BY {order}"
+        )
+        rows = self._read(lambda tx: tx.run(query, min_count=min_count, prefix=prefix).data())
+        return [
+            {"name": r["name"], "total": r["total"], "open": r["total"] - r["done"], "done": r["done"]}
+            for r in rows
+        ]
+
+    def apply_ops(self, ops: List[Dict]) -> int:
+        """Apply queued operations (see `tasker.offline`) in one write transaction.
+
+        Consecutive operations of the same kind are sent as one UNWIND
+        statement, keeping the original order between kinds. Every statement
+        is idempotent, so replaying operations that were already applied is
+        harmless. Returns the number of operations applied.
+        """
+        groups: List[tuple] = []
+        for op in ops:
+            kind = op.get("op")
+            if kind not in APPLY_OPS_QUERIES:
+                raise ValueError(f"unknown queued operation: {kind}")
+            if groups and groups[-1][0] == kind:
+                groups[-1][1].append(op)
+            else:
+                groups.append((kind, [op]))
+
+        def work(tx: ManagedTransaction) -> None:
+            for kind, group in groups:
+                tx.run(APPLY_OPS_QUERIES[kind], ops=group).consume()
+
+        if groups:
+            self._write(work)
+        return len(ops)
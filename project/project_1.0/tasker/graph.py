@@ -0,0 +1,245 @@
+"""In-memory analysis of the task dependency graph.
+
+The LINK subgraph is fetched once by `TaskDB.get_link_graph` and turned into a
+compact integer-indexed graph (CSR-style `array` buffers) so the critical path,
+slack, blocker impact and cycle analyses below run without further queries.
+
+Edge direction follows `tasker link A B -k depends`: A depends on B, so B must
+be finished first and B *blocks* A.
+"""
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+
+class LinkGraph:
+    """Compact directed graph of tasks where an edge ``u -> v`` means u blocks v.
+
+    Nodes are numbered ``0..n-1``; `ids`, `titles` and `done` are parallel lists.
+    Successors of node ``u`` are ``targets[offsets[u]:offsets[u + 1]]``.
+    """
+
+    __slots__ = ("ids", "titles", "done", "offsets", "targets")
+
+    def __init__(self, ids: List[str], titles: List[str], done: List[bool], edges: Iterable[Tuple[int, int]]):
+        self.ids = ids
+        self.titles = titles
+        self.done = done
+        n = len(ids)
+        edge_list = list(edges)
+        # counting sort of edges by source into CSR buffers
+        counts = array("i", [0]) * (n + 1)
+        for u, _ in edge_list:
+            counts[u + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        self.offsets = array("i", counts)
+        fill = array("i", counts)
+        self.targets = array("i", [0]) * len(edge_list)
+        for u, v in edge_list:
+            self.targets[fill[u]] = v
+            fill[u] += 1
+
+    @classmethod
+    def from_rows(cls, tasks: List[Dict], links: List[Dict]) -> "LinkGraph":
+        """Build a graph from `TaskDB.get_link_graph` output.
+
+        `tasks` rows carry `id`, `title`, `done`; `links` rows carry `source`
+        (the dependent task) and `target` (the task it depends on).
+        """
+        index: Dict[str, int] = {}
+        ids: List[str] = []
+        titles: List[str] = []
+        done: List[bool] = []
+        for t in tasks:
+            if t["id"] in index:
+                continue
+            index[t["id"]] = len(ids)
+            ids.append(t["id"])
+            titles.append(t.get("title") or "")
+            done.append(bool(t.get("done")))
+        edges = [(index[r["target"]], index[r["source"]]) for r in links if r["source"] in index and r["target"] in index]
+        return cls(ids, titles, done, edges)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def successors(self, u: int) -> array:
+        """Return the nodes blocked directly by `u`."""
+        return self.targets[self.offsets[u] : self.offsets[u + 1]]
+
+
+@dataclass
+class PathAnalysis:
+    """Result of `analyze`; lists are indexed by node number."""
+
+    critical_path: List[int] = field(default_factory=list)
+    earliest: List[int] = field(default_factory=list)
+    slack: List[int] = field(default_factory=list)
+    fan_out: List[int] = field(default_factory=list)
+    impact: List[int] = field(default_factory=list)
+    cycles: List[List[int]] = field(default_factory=list)
+    unordered: List[int] = field(default_factory=list)
+
+
+def topological_order(graph: LinkGraph) -> List[int]:
+    """Return a topological order (Kahn); nodes on or behind a cycle are left out."""
+    n = len(graph)
+    indeg = array("i", [0]) * n
+    for v in graph.targets:
+        indeg[v] += 1
+    order = [u for u in range(n) if indeg[u] == 0]
+    offsets, targets = graph.offsets, graph.targets
+    i = 0
+    while i < len(order):
+        u = order[i]
+        i += 1
+        for k in range(offsets[u], offsets[u + 1]):
+            v = targets[k]
+            indeg[v] -= 1
+            if indeg[v] == 0:
+                order.append(v)
+    return order
+
+
+def find_cycles(graph: LinkGraph) -> List[List[int]]:
+    """Return strongly connected components that contain a cycle (iterative Tarjan)."""
+    n = len(graph)
+    offsets, targets = graph.offsets, graph.targets
+    index = array("i", [-1]) * n
+    low = array("i", [0]) * n
+    on_stack = bytearray(n)
+    stack: List[int] = []
+    cycles: List[List[int]] = []
+    counter = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, offsets[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        while work:
+            u, k = work[-1]
+            if k < offsets[u + 1]:
+                work[-1] = (u, k + 1)
+                v = targets[k]
+                if index[v] == -1:
+                    index[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack[v] = 1
+                    work.append((v, offsets[v]))
+                elif on_stack[v] and index[v] < low[u]:
+                    low[u] = index[v]
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[u] < low[parent]:
+                    low[parent] = low[u]
+            if low[u] == index[u]:
+                comp = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = 0
+                    comp.append(w)
+                    if w == u:
+                        break
+                if len(comp) > 1 or u in graph.successors(u):
+                    comp.reverse()
+                    cycles.append(comp)
+    return cycles
+
+
+def bounded_reach(graph: LinkGraph, u: int, limit: int) -> int:
+    """Count the tasks transitively blocked by `u`; `limit + 1` means more than `limit`."""
+    offsets, targets = graph.offsets, graph.targets
+    seen = {u}
+    stack = [u]
+    while stack:
+        x = stack.pop()
+        for k in range(offsets[x], offsets[x + 1]):
+            v = targets[k]
+            if v not in seen:
+                seen.add(v)
+                if len(seen) > limit + 1:
+                    return limit + 1
+                stack.append(v)
+    return len(seen) - 1
+
+
+def analyze(graph: LinkGraph, impact_limit: int = 0) -> PathAnalysis:
+    """Compute critical path, per-task slack, fan-out, cycles and optionally downstream impact.
+
+    Path lengths count tasks, so a lone task has a path of length 1. Slack is how
+    many extra steps a task could slip without lengthening the critical path.
+    These metrics and the cycle search take time linear in tasks plus links.
+
+    Downstream impact, the number of tasks transitively blocked by a task, is
+    only computed when `impact_limit` is positive and is capped just above it:
+    exact counts for every task need quadratic time and memory on large
+    graphs, while the cap bounds the work to about `tasks * impact_limit`
+    steps. Otherwise `impact` is all zeros.
+
+    Tasks on or behind a cycle have no defined order and are reported in
+    `unordered` with zero path metrics.
+    """
+    n = len(graph)
+    offsets, targets = graph.offsets, graph.targets
+    order = topological_order(graph)
+
+    earliest = [0] * n
+    pred = [-1] * n
+    for u in order:
+        if earliest[u] == 0:
+            earliest[u] = 1
+        nxt = earliest[u] + 1
+        for k in range(offsets[u], offsets[u + 1]):
+            v = targets[k]
+            if nxt > earliest[v]:
+                earliest[v] = nxt
+                pred[v] = u
+
+    tail = [0] * n
+    for u in reversed(order):
+        best = 0
+        for k in range(offsets[u], offsets[u + 1]):
+            v = targets[k]
+            if tail[v] > best:
+                best = tail[v]
+        tail[u] = best + 1
+
+    length = max((earliest[u] for u in order), default=0)
+    slack = [0] * n
+    for u in order:
+        slack[u] = length - (earliest[u] + tail[u] - 1)
+
+    path: List[int] = []
+    if order:
+        end = max(order, key=lambda u: earliest[u])
+        while end != -1:
+            path.append(end)
+            end = pred[end]
+        path.reverse()
+
+    in_order = bytearray(n)
+    for u in order:
+        in_order[u] = 1
+    for u in range(n):
+        if not in_order[u]:
+            # relaxed from an ordered task upstream, but has no defined position itself
+            earliest[u] = 0
+
+    return PathAnalysis(
+        critical_path=path,
+        earliest=earliest,
+        slack=slack,
+        fan_out=[offsets[u + 1] - offsets[u] for u in range(n)],
+        impact=[bounded_reach(graph, u, impact_limit) if impact_limit > 0 else 0 for u in range(n)],
+        cycles=find_cycles(graph) if len(order) < n else [],
+        unordered=[u for u in range(n) if not in_order[u]],
+    )
@@ -0,0 +1,128 @@
+"""Local latency metrics for Tasker invocations.
+
+Each CLI run appends one compact JSON line (command, duration, database
+queries and transactions, OpenAI time, exit code) to a metrics file. When the file grows past
+`MAX_BYTES` it is rotated to `<file>.1`, so history stays bounded without any
+external monitoring.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterator, List, Optional
+import json
+import os
+import time
+
+# Rotate the metrics file once it grows past this many bytes (one backup kept).
+MAX_BYTES = 1_000_000
+
+# Counters for the current process, reset by `start()`.
+_current: Dict[str, float] = {"queries": 0, "transactions": 0, "openai_ms": 0.0}
+_started: Optional[float] = None
+
+
+def metrics_path() -> str:
+    """Return the metrics file path (`TASKER_METRICS_FILE` or `~/.tasker/metrics.jsonl`)."""
+    return os.getenv("TASKER_METRICS_FILE") or os.path.join(os.path.expanduser("~"), ".tasker", "metrics.jsonl")
+
+
+def start() -> None:
+    """Reset the counters and start timing the current invocation."""
+    global _started
+    _current["queries"] = 0
+    _current["transactions"] = 0
+    _current["openai_ms"] = 0.0
+    _started = time.perf_counter()
+
+
+def count_query() -> None:
+    """Record one statement sent to the database."""
+    _current["queries"] += 1
+
+
+def count_transaction() -> None:
+    """Record one database transaction (a transaction may run several statements)."""
+    _current["transactions"] += 1
+
+
+def add_openai_time(ms: float) -> None:
+    """Record time spent waiting on the OpenAI API."""
+    _current["openai_ms"] += ms
+
+
+def record(command: str, exit_code: int, path: Optional[str] = None) -> None:
+    """Append a record for the finished invocation; never raises."""
+    if _started is None:
+        return
+    entry = {
+        "ts": round(time.time(), 3),
+        "cmd": command,
+        "ms": round((time.perf_counter() - _started) * 1000, 2),
+        "queries": int(_current["queries"]),
+        "transactions": int(_current["transactions"]),
+        "openai_ms": round(_current["openai_ms"], 2),
+        "exit": exit_code,
+    }
+    path = path or metrics_path()
+    try:
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > MAX_BYTES:
+            os.replace(path, path + ".1")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    except OSError:
+        pass
+
+
+def read_records(since: float = 0.0, path: Optional[str] = None) -> Iterator[Dict]:
+    """Yield records with a timestamp >= `since`, oldest first, including the rotated file."""
+    path = path or metrics_path()
+    for p in (path + ".1", path):
+        if not os.path.exists(p):
+            continue
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("ts", 0) >= since:
+                    yield entry
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    rank = max(int(-(-pct * len(sorted_values) // 100)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(records: Iterator[Dict]) -> List[Dict]:
+    """Group records by command and compute latency percentiles.
+
+    Returns dicts with `cmd`, `count`, `errors`, `p50`, `p95`, `p99`,
+    `avg_queries`, `avg_transactions`, and `avg_openai_ms`, sorted by command
+    name.
+    """
+    groups: Dict[str, List[Dict]] = {}
+    for entry in records:
+        groups.setdefault(entry.get("cmd", "?"), []).append(entry)
+    summary = []
+    for cmd in sorted(groups):
+        rows = groups[cmd]
+        durations = sorted(float(r.get("ms", 0)) for r in rows)
+        summary.append(
+            {
+                "cmd": cmd,
+                "count": len(rows),
+                "errors": sum(1 for r in rows if r.get("exit")),
+                "p50": percentile(durations, 50),
+                "p95": percentile(durations, 95),
+                "p99": percentile(durations, 99),
+                "avg_queries": sum(r.get("queries", 0) for r in rows) / len(rows),
+                # the oldest records have only "queries", which counted transactions
+                "avg_transactions": sum(r.get("transactions", r.get("queries", 0)) for r in rows) / len(rows),
+                "avg_openai_ms": sum(r.get("openai_ms", 0) for r in rows) / len(rows),
+            }
+        )
+    return summary
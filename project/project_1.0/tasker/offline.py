@@ -0,0 +1,185 @@
+"""Durable local queue of writes made while offline.
+
+In offline mode `add`, `complete`, `edit`, `link` and `delete` append one JSON
+line per operation to a queue file (fsynced, so an acknowledged write survives
+a crash) instead of talking to Neo4j. Each database has its own queue file, so
+`sync` only replays writes meant for the database it talks to. Appends and
+`drop` are serialised by a lock on `<queue>.lock`. New tasks get their id on
+the client, so every queued operation is idempotent and `tasker sync` can
+replay the queue in batches (see `TaskDB.apply_ops`) and safely retry after a
+partial failure.
+
+Task identifiers are resolved against the local completion index plus tasks
+added in the queue, since the database is not available.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from . import completion
+
+
+def queue_path(database: Optional[str] = None) -> str:
+    """Return the queue path for `database` (None is the home database).
+
+    The home database uses `TASKER_QUEUE_FILE` or `~/.tasker/queue.jsonl`; other
+    databases get a sibling file such as `queue-team-a.jsonl`.
+    """
+    path = os.getenv("TASKER_QUEUE_FILE") or os.path.join(os.path.expanduser("~"), ".tasker", "queue.jsonl")
+    return completion.database_path(path, database)
+
+
+@contextmanager
+def _locked(database: Optional[str] = None) -> Iterator[None]:
+    """Hold an exclusive lock on `<queue>.lock` so appends and `drop` never interleave."""
+    path = queue_path(database)
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    with open(path + ".lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def enqueue(op: str, database: Optional[str] = None, **fields: object) -> Dict:
+    """Durably append an operation to the queue of `database` and return it."""
+    entry = {"op": op, **fields}
+    line = (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+    with _locked(database), open(queue_path(database), "a+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                # a torn final line from a crash mid-append was never acknowledged;
+                # cut it off so this entry does not get glued to it
+                f.seek(0)
+                f.truncate(f.read().rfind(b"\n") + 1)
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+    return entry
+
+
+def enqueue_add(
+    title: str,
+    description: str = "",
+    tags: Optional[List[str]] = None,
+    due: Optional[str] = None,
+    priority: Optional[int] = None,
+    parent: Optional[str] = None,
+    database: Optional[str] = None,
+) -> str:
+    """Queue a new task for `database` with a client-generated id and return the id."""
+    task_id = str(uuid.uuid4())
+    created = datetime.now(timezone.utc).isoformat()
+    enqueue(
+        "add",
+        database,
+        id=task_id,
+        title=title,
+        description=description,
+        tags=tags or [],
+        created=created,
+        due=due,
+        priority=priority,
+        parent=parent,
+    )
+    return task_id
+
+
+def pending(database: Optional[str] = None) -> List[Dict]:
+    """Return the operations queued for `database`, oldest first."""
+    path = queue_path(database)
+    if not os.path.exists(path):
+        return []
+    ops: List[Dict] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                ops.append(json.loads(line))
+            except json.JSONDecodeError:
+                # a torn final line from a crash mid-append; it was never acknowledged
+                continue
+    return ops
+
+
+def drop(count: int, database: Optional[str] = None) -> None:
+    """Atomically remove the first `count` operations after they were synced.
+
+    Runs under the queue lock, so operations queued concurrently (after the
+    synced ones) are kept.
+    """
+    with _locked(database):
+        remaining = pending(database)[count:]
+        path = queue_path(database)
+        if not remaining:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        fd, tmp_path = tempfile.mkstemp(prefix="queue-", dir=os.path.dirname(path) or ".")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for entry in remaining:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+def known_tasks(database: Optional[str] = None) -> List[List[str]]:
+    """(id, title) pairs from the completion index of `database`, updated by queued adds and deletes."""
+    tasks = [list(t) for t in completion.load_cache(database).get("tasks", [])]
+    for entry in pending(database):
+        if entry.get("op") == "add":
+            tasks.insert(0, [entry["id"], entry.get("title", "")])
+        elif entry.get("op") == "delete":
+            tasks = [t for t in tasks if t[0] != entry.get("id")]
+    return tasks
+
+
+def resolve(identifier: str, database: Optional[str] = None) -> str:
+    """Resolve a numeric index, unique id prefix or full id without the database.
+
+    Raises `LookupError` with a user-facing message if it cannot be resolved.
+    """
+    tasks = known_tasks(database)
+    if identifier.isdigit():
+        idx = int(identifier) - 1
+        if idx < 0 or idx >= len(tasks):
+            raise LookupError(f"Index out of range: {identifier}")
+        return tasks[idx][0]
+    matches = [t[0] for t in tasks if t[0].startswith(identifier)]
+    if len(matches) == 1:
+        return matches[0]
+    if len(matches) > 1:
+        raise LookupError(f"Ambiguous id prefix: {identifier} matches multiple tasks")
+    try:
+        # a full id not in the local index is still accepted
+        return str(uuid.UUID(identifier))
+    except ValueError:
+        raise LookupError(f"Task not found in local index: {identifier} (run `tasker list` while online to refresh it)")
@@ -0,0 +1,198 @@
+import json
+import os
+
+import pytest
+
+from tasker import completion, metrics, offline
+from tasker.graph import LinkGraph, analyze, bounded_reach, find_cycles, topological_order
+
+
+def _graph(names, depends):
+    """Build a graph from task names and (dependent, prerequisite) pairs."""
+    tasks = [{"id": n, "title": n.upper(), "done": False} for n in names]
+    links = [{"source": s, "target": t} for s, t in depends]
+    return LinkGraph.from_rows(tasks, links)
+
+
+def _names(graph, nodes):
+    return [graph.ids[u] for u in nodes]
+
+
+def test_link_graph_builds_csr_buffers():
+    tasks = [{"id": "a", "title": "A"}, {"id": "b", "done": True}, {"id": "a", "title": "dup"}, {"id": "c", "title": "C"}]
+    # c depends on a and b, b depends on a; links to unknown tasks are dropped
+    links = [{"source": "c", "target": "a"}, {"source": "b", "target": "a"}, {"source": "c", "target": "b"}, {"source": "c", "target": "x"}]
+    g = LinkGraph.from_rows(tasks, links)
+
+    assert len(g) == 3
+    assert g.ids == ["a", "b", "c"]
+    assert g.titles == ["A", "", "C"]
+    assert g.done == [False, True, False]
+    assert list(g.offsets) == [0, 2, 3, 3]
+    assert sorted(g.successors(0)) == [1, 2]
+    assert list(g.successors(1)) == [2]
+    assert list(g.successors(2)) == []
+
+
+def test_analyze_chain():
+    g = _graph(["c", "b", "a"], [("c", "b"), ("b", "a")])
+    result = analyze(g)
+
+    assert _names(g, topological_order(g)) == ["a", "b", "c"]
+    assert _names(g, result.critical_path) == ["a", "b", "c"]
+    assert result.earliest == [3, 2, 1]
+    assert result.slack == [0, 0, 0]
+    assert result.fan_out == [0, 1, 1]
+    assert result.cycles == [] and result.unordered == []
+
+
+def test_analyze_diamond_slack():
+    # a blocks b and c1; d needs b and c2; the c branch is one step longer; e is independent
+    g = _graph(["a", "b", "c1", "c2", "d", "e"], [("b", "a"), ("c1", "a"), ("c2", "c1"), ("d", "b"), ("d", "c2")])
+    result = analyze(g)
+    slack = dict(zip(g.ids, result.slack))
+
+    assert _names(g, result.critical_path) == ["a", "c1", "c2", "d"]
+    assert dict(zip(g.ids, result.earliest)) == {"a": 1, "b": 2, "c1": 2, "c2": 3, "d": 4, "e": 1}
+    assert slack == {"a": 0, "b": 1, "c1": 0, "c2": 0, "d": 0, "e": 3}
+    assert result.impact == [0] * 6
+
+
+def test_analyze_empty_graph():
+    result = analyze(_graph([], []))
+    assert result.critical_path == [] and result.earliest == [] and result.unordered == []
+
+
+def test_self_loop_is_a_cycle():
+    g = _graph(["x", "y", "z"], [("x", "x"), ("y", "x")])
+    result = analyze(g)
+
+    assert [_names(g, cycle) for cycle in result.cycles] == [["x"]]
+    # y waits on the loop, z is unaffected
+    assert _names(g, result.unordered) == ["x", "y"]
+    assert _names(g, result.critical_path) == ["z"]
+
+
+def test_cycle_with_downstream_tasks_has_zero_path_metrics():
+    # a blocks b; b and c block each other; c blocks d
+    g = _graph(["a", "b", "c", "d"], [("b", "a"), ("c", "b"), ("b", "c"), ("d", "c")])
+    result = analyze(g)
+
+    assert [sorted(_names(g, cycle)) for cycle in result.cycles] == [["b", "c"]]
+    assert _names(g, result.unordered) == ["b", "c", "d"]
+    assert _names(g, result.critical_path) == ["a"]
+    assert result.earliest == [1, 0, 0, 0]
+    assert result.slack == [0, 0, 0, 0]
+
+
+def test_find_cycles_is_iterative():
+    # a cycle far deeper than the recursion limit
+    n = 20000
+    g = LinkGraph([str(i) for i in range(n)], [""] * n, [False] * n, [(i, (i + 1) % n) for i in range(n)])
+    cycles = find_cycles(g)
+    assert len(cycles) == 1 and sorted(cycles[0]) == list(range(n))
+
+
+def test_impact_is_capped():
+    # t0 blocks t1 blocks ... t9, and t0 also blocks t5 directly
+    names = [f"t{i}" for i in range(10)]
+    g = _graph(names, [(names[i + 1], names[i]) for i in range(9)] + [("t5", "t0")])
+
+    assert bounded_reach(g, 0, 100) == 9
+    assert bounded_reach(g, 0, 3) == 4
+    assert bounded_reach(g, 9, 3) == 0
+    assert analyze(g, impact_limit=5).impact == [6, 6, 6, 6, 5, 4, 3, 2, 1, 0]
+    assert analyze(g).impact == [0] * 10
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert metrics.percentile(values, 50) == 50
+    assert metrics.percentile(values, 95) == 95
+    assert metrics.percentile(values, 99) == 99
+    assert metrics.percentile(values, 100) == 100
+    assert metrics.percentile([7.0], 50) == 7.0
+    assert metrics.percentile([1.0, 2.0, 3.0], 0) == 1.0
+
+
+def test_summarize_groups_by_command():
+    records = [
+        {"cmd": "list", "ms": 10, "queries": 2, "transactions": 1, "openai_ms": 0, "exit": 0},
+        {"cmd": "list", "ms": 30, "queries": 4, "transactions": 1, "openai_ms": 0, "exit": 1},
+        # written before transactions were recorded separately
+        {"cmd": "add", "ms": 5, "queries": 3, "openai_ms": 100, "exit": 0},
+    ]
+    add, lst = metrics.summarize(iter(records))
+
+    assert (add["cmd"], add["count"], add["errors"], add["avg_queries"], add["avg_transactions"], add["avg_openai_ms"]) == ("add", 1, 0, 3, 3, 100)
+    assert (lst["cmd"], lst["count"], lst["errors"], lst["p50"], lst["p99"]) == ("list", 2, 1, 10, 30)
+    assert (lst["avg_queries"], lst["avg_transactions"]) == (3, 1)
+
+
+def test_metrics_record_rotates_and_reads_back(tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.jsonl")
+    monkeypatch.setattr(metrics, "MAX_BYTES", 200)
+    for i in range(6):
+        metrics.start()
+        metrics.count_query()
+        metrics.count_transaction()
+        metrics.record(f"cmd{i}", 0, path=path)
+
+    assert os.path.exists(path + ".1")
+    records = list(metrics.read_records(path=path))
+    # one backup is kept, so the oldest records may be gone, but order is preserved
+    assert [r["cmd"] for r in records] == [f"cmd{i}" for i in range(6 - len(records), 6)]
+    assert all(r["queries"] == 1 and r["transactions"] == 1 for r in records)
+    assert list(metrics.read_records(since=records[-1]["ts"] + 1, path=path)) == []
+
+
+@pytest.fixture
+def queue_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("TASKER_QUEUE_FILE", str(tmp_path / "queue.jsonl"))
+    monkeypatch.setenv("TASKER_COMPLETION_CACHE", str(tmp_path / "completion.json"))
+    return tmp_path
+
+
+def test_offline_queue_per_database(queue_env):
+    home = offline.enqueue_add("Home task")
+    team = offline.enqueue_add("Team task", database="team-a")
+    offline.enqueue("complete", id=home)
+
+    assert [e["op"] for e in offline.pending()] == ["add", "complete"]
+    assert [e["id"] for e in offline.pending("team-a")] == [team]
+    assert os.path.exists(queue_env / "queue-team-a.jsonl")
+
+    offline.drop(1)
+    assert [e["op"] for e in offline.pending()] == ["complete"]
+    assert [e["id"] for e in offline.pending("team-a")] == [team]
+    offline.drop(1)
+    assert offline.pending() == []
+    assert not os.path.exists(queue_env / "queue.jsonl")
+
+
+def test_offline_enqueue_cuts_torn_tail(queue_env):
+    offline.enqueue("complete", id="a")
+    with open(offline.queue_path(), "ab") as f:
+        f.write(b'{"op": "delete", "id": ')
+    # a torn line is skipped when reading and cut off by the next append
+    assert [e["id"] for e in offline.pending()] == ["a"]
+    offline.enqueue("complete", id="b")
+    assert [e["id"] for e in offline.pending()] == ["a", "b"]
+
+
+def test_offline_resolve_uses_index_and_queue(queue_env):
+    completion.write_cache([{"id": "aaaa-1111", "title": "Old"}, {"id": "bbbb-2222", "title": "Gone"}])
+    added = offline.enqueue_add("New")
+    offline.enqueue("delete", id="bbbb-2222")
+
+    assert offline.known_tasks() == [[added, "New"], ["aaaa-1111", "Old"]]
+    assert offline.resolve("1") == added
+    assert offline.resolve("aaaa") == "aaaa-1111"
+    with pytest.raises(LookupError):
+        offline.resolve("3")
+    with pytest.raises(LookupError):
+        offline.resolve("bbbb")
+    # other databases have their own queue and index
+    assert offline.known_tasks("team-a") == []
+    with open(offline.queue_path(), "r", encoding="utf-8") as f:
+        assert [json.loads(line)["op"] for line in f] == ["add", "delete"]
@@ -0,0 +1,69 @@
+"""Micro-benchmark for Task (de)serialization and JSONStorage load/save.
+
+Run from the tasks5 directory:
+
+    python benchmarks/bench_storage.py --tasks 100000
+
+Times are reported per 100k tasks so runs with different sizes compare.
+"""
+import argparse
+import dataclasses
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tasks_cli.models import Task  # noqa: E402
+from tasks_cli.storage import ENCODINGS, LAYOUTS, JSONStorage  # noqa: E402
+
+
+def make_tasks(n):
+    tasks = []
+    for i in range(n):
+        t = Task.create(f"Task {i}", description=f"description for task {i}", priority="high" if i % 7 == 0 else None)
+        if i % 3 == 0:
+            t.status = "completed"
+        tasks.append(t)
+    return tasks
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def report(name, seconds, n):
+    per_100k = seconds * 100_000 / n * 1000
+    print(f"{name:<28} {per_100k:10.1f} ms/100k  {n / seconds:12,.0f} tasks/s")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser()
+    p.add_argument("--tasks", type=int, default=100_000)
+    args = p.parse_args(argv)
+    n = args.tasks
+    tasks = make_tasks(n)
+    dicts = [t.to_dict() for t in tasks]
+
+    print(f"{n} tasks")
+    report("to_dict (dataclasses.asdict)", timed(lambda: [dataclasses.asdict(t) for t in tasks]), n)
+    report("to_dict", timed(lambda: [t.to_dict() for t in tasks]), n)
+    report("to_row", timed(lambda: [t.to_row() for t in tasks]), n)
+    report("from_dict", timed(lambda: [Task.from_dict(d) for d in dicts]), n)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for layout in LAYOUTS:
+            for encoding in ENCODINGS:
+                name = f"{layout}, {encoding}"
+                path = os.path.join(tmp, f"{layout}-{encoding}.json")
+                report(f"save ({name})", timed(lambda: JSONStorage(path, layout=layout, encoding=encoding).save(tasks)), n)
+                report(f"load ({name})", timed(lambda: JSONStorage(path).load()), n)
+                report(f"stream ({name})", timed(lambda: sum(1 for _ in JSONStorage(path).iter_tasks())), n)
+                print(f"{'size (' + name + ')':<28} {os.path.getsize(path) / 1e6:10.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
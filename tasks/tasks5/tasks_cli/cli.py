@@ -1,14 +1,40 @@
 import argparse
+import json
 import os
+import sys
 from typing import Optional
 
 from .models import Task
-from .storage import JSONStorage
+from .storage import ENCODINGS, LAYOUTS, JSONStorage
+from .partitioned import PartitionedStorage
+from .sqlite_storage import SQLiteStorage
 
 
-def get_storage(path: "Optional[str]" = None) -> JSONStorage:
+# storage opened by the running command, for --lock-stats
+_last_storage = None
+
+
+def get_storage(path: "Optional[str]" = None, **options):
     from typing import Optional
-    return JSONStorage(path=path)
+    global _last_storage
+    if path and path.endswith(".sqlite"):
+        _last_storage = SQLiteStorage(path)
+    elif path and (path.endswith(("/", os.sep)) or os.path.isdir(path)):
+        _last_storage = PartitionedStorage(path.rstrip("/" + os.sep) or path, **options)
+    else:
+        _last_storage = JSONStorage(path=path, **options)
+    return _last_storage
+
+
+def print_lock_stats(storage):
+    stats = getattr(storage, "lock_stats", None)
+    if stats is None:
+        return
+    print(
+        f"lock: {stats['shared']} shared, {stats['exclusive']} exclusive, "
+        f"waited {stats['wait_ms']:.1f} ms (max {stats['max_wait_ms']:.1f} ms)",
+        file=sys.stderr,
+    )
 
 
 def cmd_create(args):
@@ -20,8 +46,8 @@ def cmd_create(args):
 
 def cmd_list(args):
     storage = get_storage(args.db)
-    tasks = storage.list_tasks(status=args.status, q=args.q)
-    for t in tasks:
+    options = {"history": True} if args.history and isinstance(storage, PartitionedStorage) else {}
+    for t in storage.iter_tasks(status=args.status, q=args.q, **options):
         print(f"{t.id}  [{t.status}] {t.title}")
 
 
@@ -48,9 +74,82 @@ def cmd_edit(args):
     print(args.id)
 
 
+def cmd_migrate(args):
+    storage = get_storage(args.db)
+    if isinstance(storage, JSONStorage):
+        raise ValueError("--db must be a .sqlite file or a partitioned store directory to migrate into")
+    tasks = JSONStorage(path=args.source).load()
+    storage.save(tasks)
+    print(f"migrated {len(tasks)} tasks to {storage.path}")
+
+
+def cmd_convert(args):
+    if args.db and args.db.endswith(".sqlite"):
+        raise ValueError("convert rewrites JSON stores; use migrate to fill a .sqlite store")
+    storage = get_storage(args.db, layout=args.layout, encoding=args.encoding)
+    storage.compact()
+    summary = f"{storage.path}: {args.encoding or 'unchanged'} encoding, {args.layout or 'unchanged'} layout"
+    if os.path.isfile(storage.path):
+        summary += f", {os.path.getsize(storage.path)} bytes"
+    print(summary)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def apply_op(storage, op: dict) -> str:
+    """Apply one batch operation and return the id of the task it touched."""
+    kind = op.get("op")
+    if kind == "create":
+        task = Task.create(title=op.get("title"), description=op.get("description"))
+        storage.add_task(task)
+        return task.id
+    if kind not in ("edit", "complete", "delete"):
+        raise ValueError(f"unknown op: {kind}")
+    task_id = op.get("id")
+    if not task_id:
+        raise ValueError("missing id")
+    if kind == "edit":
+        storage.update_task(task_id, **{k: op[k] for k in ("title", "description") if k in op})
+    elif kind == "complete":
+        storage.update_task(task_id, status="completed")
+    else:
+        storage.delete_task(task_id)
+    return task_id
+
+
+def cmd_batch(args):
+    storage = get_storage(args.db)
+    total = failed = 0
+    try:
+        with storage.batch():
+            for lineno, line in enumerate(sys.stdin, 1):
+                if not line.strip():
+                    continue
+                total += 1
+                try:
+                    op = json.loads(line)
+                    if not isinstance(op, dict):
+                        raise ValueError("operation must be a JSON object")
+                    result = {"line": lineno, "ok": True, "id": apply_op(storage, op)}
+                except Exception as e:
+                    failed += 1
+                    message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+                    result = {"line": lineno, "ok": False, "error": message}
+                print(json.dumps(result, ensure_ascii=False))
+            if failed and args.atomic:
+                raise _Rollback()
+    except _Rollback:
+        raise RuntimeError(f"{failed} of {total} operations failed; nothing was saved")
+    if failed:
+        raise RuntimeError(f"{failed} of {total} operations failed")
+
+
 def build_parser():
     p = argparse.ArgumentParser(prog="tasks-cli")
-    p.add_argument("--db", help="path to tasks db file", default=os.environ.get("TASKS_DB"))
+    p.add_argument("--db", help="path to tasks db file (.sqlite uses SQLite, a directory is partitioned by month)", default=os.environ.get("TASKS_DB"))
+    p.add_argument("--lock-stats", action="store_true", help="print file lock wait times to stderr")
     sub = p.add_subparsers(dest="cmd")
 
     c_create = sub.add_parser("create")
@@ -61,6 +160,7 @@ def build_parser():
     c_list = sub.add_parser("list")
     c_list.add_argument("--status", choices=["open", "completed"]) 
     c_list.add_argument("--q")
+    c_list.add_argument("--history", action="store_true", help="partitioned stores: include months with no open tasks")
     c_list.set_defaults(func=cmd_list)
 
     c_complete = sub.add_parser("complete")
@@ -77,6 +177,19 @@ def build_parser():
     c_edit.add_argument("--description")
     c_edit.set_defaults(func=cmd_edit)
 
+    c_batch = sub.add_parser("batch", help="apply NDJSON operations from stdin in one write")
+    c_batch.add_argument("--atomic", action="store_true", help="save nothing if any operation fails")
+    c_batch.set_defaults(func=cmd_batch)
+
+    c_convert = sub.add_parser("convert", help="rewrite the JSON store with another encoding or layout")
+    c_convert.add_argument("--encoding", choices=ENCODINGS)
+    c_convert.add_argument("--layout", choices=LAYOUTS)
+    c_convert.set_defaults(func=cmd_convert)
+
+    c_migrate = sub.add_parser("migrate", help="copy a JSON store into a SQLite or partitioned --db")
+    c_migrate.add_argument("--source", required=True, help="JSON store to read")
+    c_migrate.set_defaults(func=cmd_migrate)
+
     return p
 
 
@@ -91,6 +204,9 @@ def main(argv=None):
     except Exception as e:
         print(f"Error: {e}")
         return 2
+    finally:
+        if args.lock_stats and _last_storage is not None:
+            print_lock_stats(_last_storage)
     return 0
 
 
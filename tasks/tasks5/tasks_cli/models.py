@@ -1,4 +1,4 @@
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 import uuid
@@ -8,8 +8,15 @@ def now_iso():
     return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
 
+# Field order of `Task`, also the column order of the "rows" storage layout.
+FIELDS = ("id", "title", "description", "status", "created_at", "updated_at", "due_date", "priority")
+
+
 @dataclass
 class Task:
+    # no per-instance __dict__: smaller objects and faster attribute access
+    __slots__ = FIELDS
+
     id: str
     title: str
     description: Optional[str]
@@ -37,10 +44,34 @@ class Task:
         )
 
     def to_dict(self):
-        return asdict(self)
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "status": self.status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "due_date": self.due_date,
+            "priority": self.priority,
+        }
+
+    def to_row(self) -> list:
+        return [self.id, self.title, self.description, self.status, self.created_at, self.updated_at, self.due_date, self.priority]
+
+    @staticmethod
+    def from_row(row) -> "Task":
+        return Task(*row)
 
     @staticmethod
     def from_dict(d: dict) -> "Task":
+        try:
+            # records written by this package have every field
+            return Task(
+                d["id"], d["title"], d["description"], d["status"],
+                d["created_at"], d["updated_at"], d["due_date"], d["priority"],
+            )
+        except KeyError:
+            pass
         return Task(
             id=d["id"],
             title=d.get("title", ""),
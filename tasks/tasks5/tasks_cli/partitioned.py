@@ -0,0 +1,231 @@
+import json
+import os
+import re
+import tempfile
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from .models import Task
+from .storage import INDEX_SUFFIX, JOURNAL_SUFFIX, FileLock, JSONStorage
+
+MANIFEST = "manifest.json"
+UNDATED = "undated"
+MONTH_RE = re.compile(r"\d{4}-\d{2}")
+SHARD_FILE_RE = re.compile(r"(\d{4}-\d{2}|%s)\.json(?:%s)?" % (UNDATED, re.escape(JOURNAL_SUFFIX)))
+
+
+def shard_key(task: Task) -> str:
+    """Partition of a task: the month it was created in, e.g. "2026-10"."""
+    m = MONTH_RE.match(task.created_at or "")
+    return m.group(0) if m else UNDATED
+
+
+def _chronological(keys) -> List[str]:
+    return sorted(keys, key=lambda k: (k != UNDATED, k))
+
+
+class PartitionedStorage:
+    """Task store split into one `JSONStorage` shard per month of `created_at`.
+
+    `path` is a directory holding the shards (`2026-10.json`, ..., each with
+    its own journal, lock and search index) and `manifest.json`, which counts
+    the tasks and open tasks of every shard. Listing reads only the hot
+    shards, the newest one plus any that still have open tasks, unless
+    `history=True`, so months of completed tasks are not parsed for everyday
+    use. Lookups by id try the hot shards first.
+
+    Changes hold an exclusive lock on `manifest.lock`, taken before any
+    shard lock, which keeps the manifest consistent across processes. Counts
+    are raised before and lowered after the shard is written, so after a
+    crash they can only make an extra shard hot, never hide an open task.
+    """
+
+    def __init__(self, path: str, **options):
+        self.path = path
+        # layout/encoding for the shards
+        self._options = options
+        self.manifest_path = os.path.join(path, MANIFEST)
+        self._lock = FileLock(os.path.join(path, "manifest.lock"))
+        self.lock_stats = self._lock.stats
+        self._shards: Dict[str, JSONStorage] = {}
+        # while batch() runs: the shard batches entered so far and the pending manifest
+        self._batch: Optional[ExitStack] = None
+        self._batched: Set[str] = set()
+        self._manifest: Optional[dict] = None
+
+    def _locked(self, exclusive: bool = False):
+        os.makedirs(self.path, exist_ok=True)
+        return self._lock.hold(exclusive)
+
+    def _shard(self, key: str) -> JSONStorage:
+        shard = self._shards.get(key)
+        if shard is None:
+            shard = self._shards[key] = JSONStorage(os.path.join(self.path, f"{key}.json"), **self._options)
+        if self._batch is not None and key not in self._batched:
+            self._batch.enter_context(shard.batch())
+            self._batched.add(key)
+        return shard
+
+    def _read_manifest(self) -> dict:
+        if self._manifest is not None:
+            return self._manifest
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return self._rebuild_manifest()
+
+    def _rebuild_manifest(self) -> dict:
+        """Recount every shard on disk; used when the manifest is missing or unreadable."""
+        shards = {}
+        names = os.listdir(self.path) if os.path.isdir(self.path) else []
+        for key in {m.group(1) for m in map(SHARD_FILE_RE.fullmatch, names) if m}:
+            statuses = [t.status for t in self._shard(key).iter_tasks()]
+            shards[key] = {"tasks": len(statuses), "open": statuses.count("open")}
+        return {"partition": "month", "shards": shards}
+
+    def _write_manifest(self, manifest: dict):
+        if self._batch is not None:
+            # written once when the batch ends
+            return
+        fd, tmp_path = tempfile.mkstemp(prefix="manifest-", dir=self.path)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _hot_keys(self, manifest: dict) -> List[str]:
+        keys = _chronological(manifest["shards"])
+        hot = [k for k in keys if manifest["shards"][k]["open"] > 0]
+        if keys and keys[-1] not in hot:
+            hot.append(keys[-1])
+        return hot
+
+    def _find(self, task_id: str) -> Tuple[str, JSONStorage, Task]:
+        manifest = self._read_manifest()
+        hot = self._hot_keys(manifest)
+        cold = [k for k in _chronological(manifest["shards"]) if k not in hot]
+        for key in list(reversed(hot)) + list(reversed(cold)):
+            shard = self._shard(key)
+            try:
+                return key, shard, shard.get(task_id)
+            except KeyError:
+                continue
+        raise KeyError(f"task not found: {task_id}")
+
+    def _change(self, key: str, tasks: int, open_: int, apply: Callable):
+        """Run `apply` on shard `key` and adjust its manifest counts by the given deltas."""
+        manifest = self._read_manifest()
+        entry = manifest["shards"].setdefault(key, {"tasks": 0, "open": 0})
+        if tasks > 0 or open_ > 0:
+            entry["tasks"] += max(tasks, 0)
+            entry["open"] += max(open_, 0)
+            self._write_manifest(manifest)
+        try:
+            result = apply()
+        except Exception:
+            if tasks > 0 or open_ > 0:
+                entry["tasks"] -= max(tasks, 0)
+                entry["open"] -= max(open_, 0)
+                self._write_manifest(manifest)
+            raise
+        if tasks < 0 or open_ < 0:
+            entry["tasks"] += min(tasks, 0)
+            entry["open"] += min(open_, 0)
+            self._write_manifest(manifest)
+        return result
+
+    @contextmanager
+    def batch(self):
+        """Apply several changes with one journal write per touched shard and one manifest write.
+
+        If the block raises nothing is written. Shards commit one after the
+        other, so a crash while the batch is being written can leave only
+        some shards updated.
+        """
+        with self._locked(exclusive=True):
+            if self._batch is not None:
+                yield self
+                return
+            self._manifest = self._read_manifest()
+            try:
+                with ExitStack() as stack:
+                    self._batch, self._batched = stack, set()
+                    try:
+                        yield self
+                    finally:
+                        self._batch = None
+                manifest = self._manifest
+            finally:
+                self._manifest = None
+            self._write_manifest(manifest)
+
+    def load(self) -> List[Task]:
+        return list(self.iter_tasks(history=True))
+
+    def save(self, tasks: List[Task]):
+        groups: Dict[str, List[Task]] = {}
+        for t in tasks:
+            groups.setdefault(shard_key(t), []).append(t)
+        with self._locked(exclusive=True):
+            for key in set(self._read_manifest()["shards"]) - set(groups):
+                base = os.path.join(self.path, f"{key}.json")
+                for p in (base, base + JOURNAL_SUFFIX, base + INDEX_SUFFIX):
+                    if os.path.exists(p):
+                        os.remove(p)
+                self._shards.pop(key, None)
+            for key, group in groups.items():
+                self._shard(key).save(group)
+            self._write_manifest({
+                "partition": "month",
+                "shards": {k: {"tasks": len(g), "open": sum(t.status == "open" for t in g)} for k, g in groups.items()},
+            })
+
+    def compact(self):
+        """Compact every shard (rewriting it with this instance's layout/encoding)."""
+        with self._locked(exclusive=True):
+            for key in self._read_manifest()["shards"]:
+                self._shard(key).compact()
+
+    def add_task(self, task: Task):
+        with self._locked(exclusive=True):
+            key = shard_key(task)
+            self._change(key, 1, int(task.status == "open"), lambda: self._shard(key).add_task(task))
+
+    def update_task(self, task_id: str, **updates) -> Task:
+        with self._locked(exclusive=True):
+            key, shard, t = self._find(task_id)
+            was_open = t.status == "open"
+            now_open = updates["status"] == "open" if "status" in updates else was_open
+            return self._change(key, 0, int(now_open) - int(was_open), lambda: shard.update_task(task_id, **updates))
+
+    def delete_task(self, task_id: str):
+        with self._locked(exclusive=True):
+            key, shard, t = self._find(task_id)
+            self._change(key, -1, -int(t.status == "open"), lambda: shard.delete_task(task_id))
+
+    def list_tasks(self, status: Optional[str] = None, q: Optional[str] = None, history: bool = False) -> List[Task]:
+        return list(self.iter_tasks(status=status, q=q, history=history))
+
+    def iter_tasks(self, status: Optional[str] = None, q: Optional[str] = None, history: bool = False) -> Iterator[Task]:
+        """Yield matching tasks shard by shard, oldest month first.
+
+        Without `history` only the hot shards are read; for `status="open"`
+        only shards that have open tasks.
+        """
+        with self._locked():
+            manifest = self._read_manifest()
+            if history:
+                keys = _chronological(manifest["shards"])
+            elif status == "open":
+                keys = [k for k in self._hot_keys(manifest) if manifest["shards"][k]["open"] > 0]
+            else:
+                keys = self._hot_keys(manifest)
+        for key in keys:
+            yield from self._shard(key).iter_tasks(status=status, q=q)
+
+    def get(self, task_id: str) -> Task:
+        with self._locked():
+            return self._find(task_id)[2]
@@ -0,0 +1,202 @@
+import json
+import os
+import re
+import tempfile
+from typing import BinaryIO, Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+# Bumped whenever the sidecar layout changes; older files are rebuilt.
+VERSION = 2
+# Digits of the snapshot offset and position fields of the fixed-width records.
+OFFSET_DIGITS = 12
+POS_DIGITS = 10
+
+
+def tokens(*texts: Optional[str]) -> Set[str]:
+    """Lowercase words of the given texts."""
+    return set(TOKEN_RE.findall(" ".join(t for t in texts if t).lower()))
+
+
+def query_words(q: str) -> List[str]:
+    """Words of a query, longest first (the most selective is looked up first)."""
+    return sorted(tokens(q), key=len, reverse=True)
+
+
+def matches(words: List[str], *texts: Optional[str]) -> bool:
+    """Whether every query word is a prefix of some word of `texts`."""
+    have = tokens(*texts)
+    return bool(words) and all(any(w.startswith(word) for w in have) for word in words)
+
+
+class TermIndex:
+    """Inverted index from word to the tasks whose title or description contain it.
+
+    A query matches a task when every query word is a prefix of some word of
+    the task, so "rep mon" finds "Monthly report". The index describes one
+    snapshot (tagged with its stamp) and lives in a sidecar file that is read
+    by seeking rather than loaded, so a query costs time proportional to the
+    matching terms and tasks rather than to the number of tasks:
+
+    - a JSON header line;
+    - one fixed-width record per task in snapshot order: id and byte offset
+      of the task's record in the snapshot (when the snapshot is seekable);
+    - the same ids sorted, each with its position, to find a task by id;
+    - the positions of the tasks containing each word, one line per word;
+    - one short `term<TAB>start<TAB>length` line per word pointing into the
+      positions, sorted and searched by bisection.
+
+    Changes made since the snapshot are not in the file; callers overlay them.
+    """
+
+    def __init__(self, f: BinaryIO, header: dict):
+        self._f = f
+        self.count: int = header["count"]
+        self.seekable: bool = header["seekable"]
+        # snapshot columns for the rows layout, None for objects
+        self.columns: Optional[List[str]] = header.get("columns")
+        self._width: int = header["width"]
+        self._records = f.tell()
+        self._by_id = self._records + self.count * (self._width + 2 + OFFSET_DIGITS)
+        self._postings = self._by_id + self.count * (self._width + 2 + POS_DIGITS)
+        self._terms = self._postings + header["postings"]
+        self._end = f.seek(0, os.SEEK_END)
+
+    @staticmethod
+    def write(path: str, stamp: Tuple[int, int], records: Iterable[Tuple[int, dict]], seekable: bool, meta: Optional[dict] = None):
+        """Atomically write the index of a snapshot from its `(byte offset, task dict)` records.
+
+        `meta["columns"]`, filled in while `records` is consumed, names the
+        columns of a snapshot in the rows layout.
+        """
+        ids: List[bytes] = []
+        offsets: List[int] = []
+        postings: Dict[str, List[int]] = {}
+        for pos, (offset, d) in enumerate(records):
+            ids.append(json.dumps(d.get("id")).encode("ascii"))
+            offsets.append(offset if seekable else -1)
+            for term in tokens(d.get("title"), d.get("description")):
+                postings.setdefault(term, []).append(pos)
+        width = max(map(len, ids), default=0)
+        terms = sorted(postings)
+        lines = [",".join(map(str, postings[t])).encode("ascii") + b"\n" for t in terms]
+        header = {"version": VERSION, "stamp": list(stamp), "count": len(ids), "width": width, "seekable": seekable, "columns": (meta or {}).get("columns"), "postings": sum(map(len, lines))}
+        fd, tmp_path = tempfile.mkstemp(prefix="tasks-idx-", dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                f.writelines(b"%s %0*d\n" % (i.ljust(width), OFFSET_DIGITS, o + 1) for i, o in zip(ids, offsets))
+                padded = sorted((i.ljust(width), pos) for pos, i in enumerate(ids))
+                f.writelines(b"%s %0*d\n" % (i, POS_DIGITS, pos) for i, pos in padded)
+                f.writelines(lines)
+                start = 0
+                for term, line in zip(terms, lines):
+                    f.write(b"%s\t%d\t%d\n" % (term.encode("utf-8"), start, len(line) - 1))
+                    start += len(line)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def open(cls, path: str, stamp: Optional[Tuple[int, int]]) -> Optional["TermIndex"]:
+        """Open the index saved for the snapshot with `stamp`; None if missing or stale."""
+        if stamp is None:
+            return None
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return None
+        try:
+            header = json.loads(f.readline())
+            if header.get("version") == VERSION and header.get("stamp") == list(stamp):
+                return cls(f, header)
+        except (ValueError, KeyError):
+            pass
+        f.close()
+        return None
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self) -> "TermIndex":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _line_at(self, offset: int) -> bytes:
+        self._f.seek(offset)
+        return self._f.readline()
+
+    def _first_at_least(self, key: bytes) -> int:
+        """Offset of the first term line whose term is >= `key`."""
+        lo, hi = self._terms, self._end
+        # lo and hi are line starts; lines before lo sort below key, the line at hi does not
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = mid
+            if mid > lo:
+                self._f.seek(mid)
+                self._f.readline()
+                start = self._f.tell()
+            if start >= hi:
+                # no line starts in (mid, hi): decide on the line at lo
+                start = lo
+            line = self._line_at(start)
+            if line.split(b"\t", 1)[0] >= key:
+                hi = start
+            else:
+                lo = start + len(line)
+        return lo
+
+    def _lookup(self, word: str) -> Set[int]:
+        key = word.encode("utf-8")
+        spans = []
+        self._f.seek(self._first_at_least(key))
+        for line in self._f:
+            term, start, length = line.split(b"\t")
+            if not term.startswith(key):
+                break
+            spans.append((int(start), int(length)))
+        found: Set[int] = set()
+        for start, length in spans:
+            self._f.seek(self._postings + start)
+            found.update(map(int, self._f.read(length).split(b",")))
+        return found
+
+    def search(self, words: List[str]) -> Set[int]:
+        """Positions of the snapshot tasks matching every word; none if there are no words."""
+        result: Optional[Set[int]] = None
+        for word in words:
+            positions = self._lookup(word)
+            result = positions if result is None else result & positions
+            if not result:
+                break
+        return result or set()
+
+    def record(self, pos: int) -> Tuple[str, int]:
+        """Id of the task at snapshot position `pos` and its byte offset (-1 if unknown)."""
+        size = self._width + 2 + OFFSET_DIGITS
+        self._f.seek(self._records + pos * size)
+        line = self._f.read(size)
+        return json.loads(line[: self._width]), int(line[self._width + 1 :]) - 1
+
+    def position(self, task_id: str) -> int:
+        """Snapshot position of `task_id`, or -1 if it is not in the snapshot."""
+        key = json.dumps(task_id).encode("ascii").ljust(self._width)
+        if len(key) > self._width:
+            return -1
+        size = self._width + 2 + POS_DIGITS
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            line = self._line_at(self._by_id + mid * size)
+            if line[: self._width] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            line = self._line_at(self._by_id + lo * size)
+            if line[: self._width] == key:
+                return int(line[self._width + 1 :])
+        return -1
@@ -0,0 +1,167 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from .models import FIELDS, Task
+from .storage import apply_updates
+
+COLUMNS = FIELDS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    description TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT,
+    due_date TEXT,
+    priority TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks(status, seq);
+CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks(due_date);
+CREATE INDEX IF NOT EXISTS tasks_priority ON tasks(priority);
+"""
+
+# External-content FTS5 index over title/description, kept in sync by triggers.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(title, description, content='tasks', content_rowid='seq');
+CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+    INSERT INTO tasks_fts(rowid, title, description) VALUES (new.seq, new.title, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+    INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.seq, old.title, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+    INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.seq, old.title, old.description);
+    INSERT INTO tasks_fts(rowid, title, description) VALUES (new.seq, new.title, new.description);
+END;
+"""
+
+
+def _fts_query(q: str) -> str:
+    # every word must match as a prefix; quoting keeps FTS operators literal
+    return " ".join('"%s"*' % word.replace('"', '""') for word in q.split())
+
+
+class SQLiteStorage:
+    """Task store backed by a SQLite database, with the same API as `JSONStorage`.
+
+    Status, due date and priority are indexed columns, and `q` is answered
+    from an FTS5 index (each word matches as a word prefix). If the SQLite
+    build has no FTS5, `q` falls back to a substring scan with LIKE.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        parent = os.path.dirname(path)
+        if parent and not os.path.exists(parent):
+            os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+            try:
+                self._conn.executescript(FTS_SCHEMA)
+                self._fts = True
+            except sqlite3.OperationalError:
+                self._fts = False
+        self._in_batch = False
+
+    @contextmanager
+    def _tx(self):
+        if self._in_batch:
+            yield
+        else:
+            with self._conn:
+                # take the write lock first, so reads in the block see what is written on top of them
+                self._conn.execute("BEGIN IMMEDIATE")
+                yield
+
+    @contextmanager
+    def batch(self):
+        """Apply several changes in one transaction; nothing is written if the block raises."""
+        if self._in_batch:
+            yield self
+            return
+        self._in_batch = True
+        try:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                yield self
+        finally:
+            self._in_batch = False
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def _task(row) -> Task:
+        return Task(**{c: row[c] for c in COLUMNS})
+
+    def _insert(self, tasks: List[Task]):
+        self._conn.executemany(
+            f"INSERT INTO tasks ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            [tuple(getattr(t, c) for c in COLUMNS) for t in tasks],
+        )
+
+    def load(self) -> List[Task]:
+        return [self._task(r) for r in self._conn.execute("SELECT * FROM tasks ORDER BY seq")]
+
+    def save(self, tasks: List[Task]):
+        with self._tx():
+            self._conn.execute("DELETE FROM tasks")
+            self._insert(list(tasks))
+
+    def add_task(self, task: Task):
+        with self._tx():
+            self._insert([task])
+
+    def update_task(self, task_id: str, **updates) -> Task:
+        with self._tx():
+            # read and write in one transaction, or a concurrent update could be overwritten
+            t = self.get(task_id)
+            apply_updates(t, updates)
+            self._conn.execute(
+                "UPDATE tasks SET title = ?, description = ?, status = ?, updated_at = ?, due_date = ?, priority = ? WHERE id = ?",
+                (t.title, t.description, t.status, t.updated_at, t.due_date, t.priority, t.id),
+            )
+        return t
+
+    def delete_task(self, task_id: str):
+        with self._tx():
+            cur = self._conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        if cur.rowcount == 0:
+            raise KeyError(f"task not found: {task_id}")
+
+    def list_tasks(self, status: Optional[str] = None, q: Optional[str] = None) -> List[Task]:
+        return list(self.iter_tasks(status=status, q=q))
+
+    def iter_tasks(self, status: Optional[str] = None, q: Optional[str] = None) -> Iterator[Task]:
+        sql = "SELECT tasks.* FROM tasks"
+        where, params = [], []
+        if q and q.split():
+            if self._fts:
+                sql += " JOIN tasks_fts ON tasks_fts.rowid = tasks.seq"
+                where.append("tasks_fts MATCH ?")
+                params.append(_fts_query(q))
+            else:
+                like = "%" + q.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                where.append("(lower(title) LIKE ? ESCAPE '\\' OR lower(description) LIKE ? ESCAPE '\\')")
+                params += [like, like]
+        if status:
+            where.append("tasks.status = ?")
+            params.append(status)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY tasks.seq"
+        for r in self._conn.execute(sql, params):
+            yield self._task(r)
+
+    def get(self, task_id: str) -> Task:
+        row = self._conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"task not found: {task_id}")
+        return self._task(row)
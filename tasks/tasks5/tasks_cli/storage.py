@@ -1,101 +1,881 @@
+import gzip
 import json
 import os
 import tempfile
-from typing import List, Optional
-from .models import Task, now_iso
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from .models import FIELDS, Task, now_iso
+from .search import TermIndex, matches, query_words
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+JOURNAL_SUFFIX = ".journal"
+LOCK_SUFFIX = ".lock"
+INDEX_SUFFIX = ".idx"
+# Characters read at a time when streaming the snapshot.
+STREAM_CHUNK = 1 << 16
+# Bytes first read when seeking to a single snapshot record.
+READ_CHUNK = 4096
+# Searches matching more than this fraction of the snapshot stream it instead of seeking.
+SEEK_FRACTION = 0.05
+# Fold the journal into the snapshot once it grows past this many bytes.
+COMPACT_BYTES = 1_000_000
+# Snapshot layouts: "objects" stores one JSON object per task, "rows" stores a
+# column list once and one JSON array per task (smaller, faster to parse).
+LAYOUTS = ("objects", "rows")
+# Snapshot encodings: indented JSON, JSON without whitespace, or gzipped compact
+# JSON. The encoding is named in the snapshot's "format" member; gzip files are
+# recognised by their magic bytes.
+ENCODINGS = ("pretty", "compact", "gzip")
+GZIP_MAGIC = b"\x1f\x8b"
+# Windows cannot replace a file another handle has open (e.g. a paused
+# `iter_tasks` stream), so writers retry for up to this many seconds there.
+REPLACE_TIMEOUT = 5.0
+_RETRY_REPLACE = os.name == "nt"
+
+
+def apply_updates(t: Task, updates: dict):
+    """Apply `update_task` keyword updates to `t` in place and bump `updated_at`."""
+    if "title" in updates and updates["title"] is not None:
+        if not updates["title"].strip():
+            raise ValueError("title must be non-empty")
+        t.title = updates["title"].strip()
+    if "description" in updates:
+        t.description = updates.get("description")
+    if "status" in updates:
+        t.status = updates.get("status")
+    if "due_date" in updates:
+        t.due_date = updates.get("due_date")
+    if "priority" in updates:
+        t.priority = updates.get("priority")
+    t.updated_at = now_iso()
+
+
+def _journal_records(data: bytes) -> Tuple[List[dict], int]:
+    """Parse the complete lines of a journal chunk; return the records and bytes consumed."""
+    # a torn last line is left for later, once it is finished
+    end = data.rfind(b"\n") + 1
+    records = []
+    for line in data[:end].splitlines():
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return records, end
+
+
+def _stream_records(f, offsets: bool = False, meta: Optional[dict] = None) -> Iterator:
+    """Yield the task records of a snapshot one at a time, in either layout.
+
+    Only the current record and one chunk of input are held in memory. A
+    truncated or corrupt file ends the stream at the last complete record.
+    With `offsets`, yield `(byte offset, record)` pairs instead; this needs an
+    uncompressed snapshot opened without newline translation. The columns of
+    the rows layout are stored in `meta`, if given.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos = "", 0
+    # byte offset in the file of buf[mark]
+    mark, mark_byte = 0, 0
+
+    def fill() -> bool:
+        nonlocal buf, pos, mark, mark_byte
+        try:
+            chunk = f.read(STREAM_CHUNK)
+        except (EOFError, gzip.BadGzipFile):
+            # truncated or corrupt gzip stream
+            chunk = ""
+        if offsets:
+            mark_byte += len(buf[mark:pos].encode("utf-8"))
+            mark = 0
+        buf, pos = buf[pos:] + chunk, 0
+        return bool(chunk)
+
+    def offset() -> int:
+        nonlocal mark, mark_byte
+        mark_byte += len(buf[mark:pos].encode("utf-8"))
+        mark = pos
+        return mark_byte
+
+    def peek(skip: str = "") -> str:
+        """Next character after whitespace and `skip` characters ("" at EOF)."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and (buf[pos].isspace() or buf[pos] in skip):
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                return ""
+
+    def value():
+        nonlocal pos
+        while True:
+            try:
+                obj, pos = decoder.raw_decode(buf, pos)
+                return obj
+            except json.JSONDecodeError:
+                # value continues in the next chunk
+                if not fill():
+                    raise
+
+    try:
+        if peek() != "{":
+            return
+        pos += 1
+        columns = list(FIELDS)
+        while peek(",") == '"':
+            key = value()
+            if peek(":") == "[" and key in ("tasks", "rows"):
+                pos += 1
+                while peek(",") not in ("]", ""):
+                    start = offset() if offsets else -1
+                    rec = value()
+                    rec = rec if key == "tasks" else dict(zip(columns, rec))
+                    yield (start, rec) if offsets else rec
+                pos += 1
+            else:
+                val = value()
+                if key == "columns":
+                    columns = val
+                    if meta is not None:
+                        meta["columns"] = columns
+    except json.JSONDecodeError:
+        return
+
+
+def _read_record(f, offset: int, columns: Optional[List[str]]) -> Optional[dict]:
+    """Decode the snapshot record at byte `offset` of binary file `f` (None if unreadable)."""
+    decoder = json.JSONDecoder()
+    f.seek(offset)
+    data, size = b"", READ_CHUNK
+    while True:
+        chunk = f.read(size)
+        data += chunk
+        try:
+            # a character cut at the end of the data is dropped and read again next round
+            rec = decoder.raw_decode(data.decode("utf-8", errors="ignore"))[0]
+            break
+        except json.JSONDecodeError:
+            if not chunk:
+                return None
+            size *= 2
+    return dict(zip(columns or FIELDS, rec)) if isinstance(rec, list) else rec
+
+
+def _replace(src: str, dst: str):
+    deadline = time.monotonic() + REPLACE_TIMEOUT
+    delay = 0.01
+    while True:
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if not _RETRY_REPLACE or time.monotonic() >= deadline:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        # directories cannot be opened on Windows; renames there are durable already
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _lock_fd(fd: int, exclusive: bool):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return
+    # msvcrt only has exclusive byte-range locks, so readers serialise too
+    os.lseek(fd, 0, os.SEEK_SET)
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK gives up after ~10 seconds; keep waiting
+            continue
+
+
+def _unlock_fd(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Advisory lock on a file, shared or exclusive, that orders processes.
+
+    Holds are re-entrant: a nested `hold` while the lock is held (in either
+    mode) reuses the outer hold. An RLock serialises threads sharing the
+    object. Wait times are collected in `stats`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stats = {"shared": 0, "exclusive": 0, "wait_ms": 0.0, "max_wait_ms": 0.0}
+        # in-process guard; the file lock itself only orders processes
+        self._mutex = threading.RLock()
+        self._held: Optional[int] = None
+
+    @contextmanager
+    def hold(self, exclusive: bool = False):
+        with self._mutex:
+            if self._held is not None:
+                yield
+                return
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                start = time.perf_counter()
+                _lock_fd(fd, exclusive)
+                waited = (time.perf_counter() - start) * 1000
+                self.stats["exclusive" if exclusive else "shared"] += 1
+                self.stats["wait_ms"] += waited
+                self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], waited)
+                self._held = fd
+                try:
+                    yield
+                finally:
+                    self._held = None
+                    _unlock_fd(fd)
+            finally:
+                os.close(fd)
+
+
+@dataclass
+class _QueuedWrite:
+    """A write waiting for the group commit that makes it durable."""
+
+    apply: Callable[[], Any]
+    result: Any = None
+    error: Optional[BaseException] = None
+    done: bool = False
 
 
 class JSONStorage:
-    def __init__(self, path: Optional[str] = None):
+    """Task store backed by a JSON snapshot plus an append-only journal.
+
+    Mutations append one JSON line (`put` with the full task, or `del`) to
+    `<path>.journal` and fsync it, so a write costs O(1) instead of rewriting
+    every task. Reads load the snapshot and replay the journal on top of it.
+    Once the journal grows past `compact_bytes` the current state is written
+    to a new snapshot (temp file + `os.replace`) and the journal is removed.
+    Replaying a `put` or `del` twice has no further effect, so a crash between
+    those two steps, or a torn last line, loses nothing that was acknowledged.
+
+    The state is parsed once per process into an id-keyed dict with a
+    secondary index by status, so `get`/`update_task`/`delete_task` are O(1)
+    lookups. Before every operation the snapshot's (mtime, size) stamp and the
+    journal size are checked: a new snapshot reloads everything, a longer
+    journal only replays the new records.
+
+    Processes coordinate through an advisory lock on `<path>.lock`: reads hold
+    it shared, writes exclusive, so concurrent writers never lose updates.
+    Time spent waiting for the lock is collected in `lock_stats`. Use
+    `batch()` to make several changes under one exclusive lock hold with a
+    single journal write and fsync.
+
+    Threads sharing a storage object get the same for free (group commit):
+    a write queues itself, and while one thread holds the lock and writes,
+    the writes queued meanwhile wait. The next thread to take the lock
+    applies all of them under one hold and appends them as one journal
+    record with one fsync.
+
+    Text search (`q`) uses a `TermIndex` of the current snapshot, saved as
+    `<path>.idx` by the first search after each compaction. It is read by
+    seeking, and changes made since the snapshot are overlaid from memory or
+    the journal, so a query reads only the matching terms and tasks.
+
+    Tasks returned by `get`, `load` and `list_tasks` are the cached objects;
+    change them through `update_task` rather than by assignment.
+    """
+
+    def __init__(self, path: Optional[str] = None, layout: Optional[str] = None, encoding: Optional[str] = None):
         # Default path: environment variable TASKS_DB or file in current working directory
         if path:
             self.path = path
         else:
             self.path = os.environ.get("TASKS_DB") or os.path.join(os.getcwd(), "tasks.json")
+        # Snapshot layout to write; by default (TASKS_LAYOUT unset) keep the one on disk.
+        self.layout = layout or os.environ.get("TASKS_LAYOUT") or None
+        if self.layout is not None and self.layout not in LAYOUTS:
+            raise ValueError(f"unknown layout: {self.layout} (expected one of {', '.join(LAYOUTS)})")
+        self._file_layout = "objects"
+        # Likewise for the encoding (TASKS_ENCODING).
+        self.encoding = encoding or os.environ.get("TASKS_ENCODING") or None
+        if self.encoding is not None and self.encoding not in ENCODINGS:
+            raise ValueError(f"unknown encoding: {self.encoding} (expected one of {', '.join(ENCODINGS)})")
+        self._file_encoding = "pretty"
+        self._tasks: Dict[str, Task] = {}
+        self._by_status: Dict[str, Dict[str, Task]] = {}
+        # insertion sequence number per id, to list status buckets in file order
+        self._pos: Dict[str, int] = {}
+        self._next_pos = 0
+        self.journal_path = self.path + JOURNAL_SUFFIX
+        self.compact_bytes = COMPACT_BYTES
+        self._stamp: Optional[Tuple[int, int]] = None
+        # bytes of the journal already applied to the index
+        self._journal_offset = 0
+        self._loaded = False
+        self.lock_path = self.path + LOCK_SUFFIX
+        self._lock = FileLock(self.lock_path)
+        self.lock_stats = self._lock.stats
+        # journal records buffered by batch(), written on exit
+        self._pending: Optional[List[dict]] = None
+        # thread running batch(); its writes skip the group commit queue
+        self._batch_thread: Optional[int] = None
+        # group commit: writes waiting for a leader, and whether one is writing
+        self._queue: List[_QueuedWrite] = []
+        self._queue_cond = threading.Condition()
+        self._leading = False
+        self.index_path = self.path + INDEX_SUFFIX
+        # ids changed since the snapshot was loaded; searches overlay them on the index
+        self._touched: Set[str] = set()
 
     def _ensure_parent(self):
         parent = os.path.dirname(self.path)
         if parent and not os.path.exists(parent):
             os.makedirs(parent, exist_ok=True)
 
-    def load(self) -> List[Task]:
+    def _locked(self, exclusive: bool = False):
+        self._ensure_parent()
+        return self._lock.hold(exclusive)
+
+    @contextmanager
+    def batch(self):
+        """Apply several changes under one exclusive lock and one journal fsync.
+
+        The changes are written as a single journal record when the block
+        exits, so they become visible together. If the block raises nothing
+        is written and the in-memory state is reloaded from disk.
+        """
+        with self._locked(exclusive=True):
+            if self._pending is not None:
+                yield self
+                return
+            self._refresh()
+            self._pending = []
+            self._batch_thread = threading.get_ident()
+            try:
+                yield self
+            except BaseException:
+                self._pending = None
+                self._loaded = False
+                raise
+            finally:
+                self._batch_thread = None
+            pending, self._pending = self._pending, None
+            try:
+                if len(pending) == 1:
+                    self._write_journal(pending[0])
+                elif pending:
+                    self._write_journal({"op": "batch", "ops": pending})
+            except BaseException:
+                # the index already has changes that are not on disk
+                self._loaded = False
+                raise
+
+    def _commit(self, apply: Callable[[], Any]) -> Any:
+        """Run a write through the group commit queue and return its result.
+
+        The first waiting writer becomes the leader: it takes every write
+        queued so far and applies them in one `batch()`. A write that raises
+        is skipped; the others still commit. If the journal write fails,
+        every write of the group raises.
+        """
+        if self._batch_thread == threading.get_ident():
+            return apply()
+        write = _QueuedWrite(apply)
+        with self._queue_cond:
+            self._queue.append(write)
+            while self._leading and not write.done:
+                self._queue_cond.wait()
+            if not write.done:
+                self._leading = True
+                group, self._queue = self._queue, []
+        if not write.done:
+            try:
+                with self.batch():
+                    for w in group:
+                        try:
+                            w.result = w.apply()
+                        except Exception as e:
+                            w.error = e
+            except BaseException as e:
+                for w in group:
+                    w.error = w.error or e
+            finally:
+                with self._queue_cond:
+                    for w in group:
+                        w.done = True
+                    self._leading = False
+                    self._queue_cond.notify_all()
+        if write.error is not None:
+            raise write.error
+        return write.result
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _snapshot_gzipped(self) -> bool:
+        with open(self.path, "rb") as f:
+            return f.read(2) == GZIP_MAGIC
+
+    def _open_snapshot(self):
+        """Open the snapshot for reading as text, decompressing it if it is gzipped."""
+        # no newline translation, so character counts match bytes for offsets
+        if self._snapshot_gzipped():
+            return gzip.open(self.path, "rt", encoding="utf-8", newline="")
+        return open(self.path, "r", encoding="utf-8", newline="")
+
+    def _read_file(self) -> List[Task]:
         if not os.path.exists(self.path):
             return []
-        with open(self.path, "r", encoding="utf-8") as f:
+        with self._open_snapshot() as f:
             try:
                 data = json.load(f)
-            except json.JSONDecodeError:
+            except (ValueError, EOFError, gzip.BadGzipFile):
                 return []
-        tasks = [Task.from_dict(t) for t in data.get("tasks", [])]
-        return tasks
+        self._file_encoding = data.get("format", "pretty")
+        if "rows" in data:
+            self._file_layout = "rows"
+            columns = data.get("columns", list(FIELDS))
+            if tuple(columns) == FIELDS:
+                return [Task.from_row(r) for r in data["rows"]]
+            return [Task.from_dict(dict(zip(columns, r))) for r in data["rows"]]
+        self._file_layout = "objects"
+        return [Task.from_dict(t) for t in data.get("tasks", [])]
+
+    def _index(self, task: Task):
+        old = self._tasks.get(task.id)
+        if old is not None:
+            self._by_status.get(old.status, {}).pop(task.id, None)
+        if task.id not in self._pos:
+            self._pos[task.id] = self._next_pos
+            self._next_pos += 1
+        self._tasks[task.id] = task
+        self._by_status.setdefault(task.status, {})[task.id] = task
+        self._terms_changed(task.id)
+
+    def _unindex(self, task: Task):
+        self._tasks.pop(task.id, None)
+        self._pos.pop(task.id, None)
+        bucket = self._by_status.get(task.status)
+        if bucket is not None:
+            bucket.pop(task.id, None)
+        self._terms_changed(task.id)
+
+    def _reset_index(self, tasks: List[Task]):
+        self._tasks = {}
+        self._by_status = {}
+        self._pos = {}
+        self._next_pos = 0
+        for t in tasks:
+            self._index(t)
+        self._touched = set()
+        self._loaded = True
+
+    def _terms_changed(self, task_id: str):
+        self._touched.add(task_id)
+
+    def _sidecar(self) -> Optional[TermIndex]:
+        """The search index of the snapshot on disk, built by streaming it if missing.
+
+        None if there is no snapshot. Call with the lock held.
+        """
+        stamp = self._file_stamp()
+        index = TermIndex.open(self.index_path, stamp)
+        if index is None and stamp is not None:
+            seekable = not self._snapshot_gzipped()
+            meta: dict = {}
+            with self._open_snapshot() as f:
+                if seekable:
+                    records = _stream_records(f, offsets=True, meta=meta)
+                else:
+                    records = ((-1, d) for d in _stream_records(f))
+                # `meta` gets the rows columns while write consumes the records
+                TermIndex.write(self.index_path, stamp, records, seekable, meta)
+            index = TermIndex.open(self.index_path, stamp)
+        return index
+
+    def _refresh(self):
+        """(Re)load the index if the snapshot changed and apply new journal records."""
+        stamp = self._file_stamp()
+        if not self._loaded or stamp != self._stamp:
+            self._reset_index(self._read_file())
+            self._stamp = stamp
+            self._journal_offset = 0
+        self._replay_journal()
+
+    def _replay_journal(self):
+        size = self._journal_size()
+        if size == self._journal_offset:
+            return
+        if size < self._journal_offset:
+            # journal was truncated behind our back; start over from the snapshot
+            self._loaded = False
+            self._refresh()
+            return
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._journal_offset)
+            data = f.read(size - self._journal_offset)
+        records, end = _journal_records(data)
+        for rec in records:
+            self._apply(rec)
+        self._journal_offset += end
+
+    def _apply(self, rec: dict):
+        op = rec.get("op")
+        if op == "put":
+            self._index(Task.from_dict(rec["task"]))
+        elif op == "del":
+            task = self._tasks.get(rec.get("id"))
+            if task is not None:
+                self._unindex(task)
+        elif op == "batch":
+            for sub in rec.get("ops", []):
+                self._apply(sub)
+
+    def _append(self, rec: dict):
+        if self._pending is not None:
+            self._pending.append(rec)
+        else:
+            self._write_journal(rec)
+
+    def _write_journal(self, rec: dict):
+        """Durably append one record to the journal, compacting if it grew too big."""
+        self._ensure_parent()
+        line = (json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        # apply whatever complete records are there; anything after them is torn
+        self._replay_journal()
+        with open(self.journal_path, "ab") as f:
+            if f.seek(0, os.SEEK_END) > self._journal_offset:
+                # a record torn by a crash mid-append was never acknowledged; cut it
+                # off so the new record starts on a line of its own
+                f.truncate(self._journal_offset)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+            self._journal_offset = f.tell()
+        if self._journal_offset > self.compact_bytes:
+            try:
+                self.compact()
+            except PermissionError:
+                # the snapshot is still open in a reader on Windows; the record
+                # is durable in the journal and a later write compacts instead
+                pass
+
+    def _require(self, task_id: str) -> Task:
+        self._refresh()
+        task = self._tasks.get(task_id)
+        if task is None:
+            raise KeyError(f"task not found: {task_id}")
+        return task
+
+    def load(self) -> List[Task]:
+        with self._locked():
+            self._refresh()
+            return list(self._tasks.values())
 
     def save(self, tasks: List[Task]):
+        with self._locked(exclusive=True):
+            tasks = list(tasks)
+            self._write_file(tasks)
+            self._reset_index(tasks)
+
+    def _write_file(self, tasks: List[Task]):
         self._ensure_parent()
-        data = {"tasks": [t.to_dict() for t in tasks]}
+        layout = self.layout or self._file_layout
+        encoding = self.encoding or self._file_encoding
         dir_name = os.path.dirname(self.path) or "."
         fd, tmp_path = tempfile.mkstemp(prefix="tasks-", dir=dir_name)
         try:
-            with os.fdopen(fd, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            os.replace(tmp_path, self.path)
+            with os.fdopen(fd, "wb") as raw:
+                if encoding == "gzip":
+                    f = gzip.open(raw, "wt", encoding="utf-8", compresslevel=6)
+                else:
+                    f = open(raw.fileno(), "w", encoding="utf-8", closefd=False)
+                with f:
+                    self._encode(f, tasks, layout, encoding)
+                raw.flush()
+                os.fsync(raw.fileno())
+            _replace(tmp_path, self.path)
+            # make the rename durable before the journal it supersedes goes away
+            _fsync_dir(dir_name)
+            self._file_layout = layout
+            self._file_encoding = encoding
         finally:
             if os.path.exists(tmp_path):
                 try:
                     os.remove(tmp_path)
                 except Exception:
                     pass
+        self._stamp = self._file_stamp()
+        self._touched = set()
+        if os.path.exists(self.index_path):
+            # stale now; the next search rebuilds it
+            os.remove(self.index_path)
+        # the snapshot now holds everything the journal did
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_offset = 0
+
+    @staticmethod
+    def _encode(f, tasks: List[Task], layout: str, encoding: str):
+        header = json.dumps(encoding)
+        if layout == "rows":
+            # one row per line keeps the file diffable
+            sep = "\n" if encoding == "pretty" else ""
+            f.write('{"format": %s, "columns": %s,\n"rows": [' % (header, json.dumps(list(FIELDS))))
+            f.write(",".join(sep + json.dumps(t.to_row(), ensure_ascii=False) for t in tasks))
+            f.write(sep + "]}\n")
+        elif encoding == "pretty":
+            json.dump({"format": encoding, "tasks": [t.to_dict() for t in tasks]}, f, ensure_ascii=False, indent=2)
+        else:
+            f.write('{"format":%s,"tasks":[' % header)
+            f.write(",".join(json.dumps(t.to_dict(), ensure_ascii=False, separators=(",", ":")) for t in tasks))
+            f.write("]}")
+
+    def compact(self):
+        """Write the current state to the snapshot and drop the journal."""
+        with self._locked(exclusive=True):
+            self._refresh()
+            self._write_file(list(self._tasks.values()))
 
     def add_task(self, task: Task):
-        tasks = self.load()
-        tasks.append(task)
-        self.save(tasks)
+        self._commit(lambda: self._add(task))
 
     def update_task(self, task_id: str, **updates) -> Task:
-        tasks = self.load()
-        found = False
-        for i, t in enumerate(tasks):
-            if t.id == task_id:
-                found = True
-                # apply updates
-                if "title" in updates and updates["title"] is not None:
-                    if not updates["title"].strip():
-                        raise ValueError("title must be non-empty")
-                    t.title = updates["title"].strip()
-                if "description" in updates:
-                    t.description = updates.get("description")
-                if "status" in updates:
-                    t.status = updates.get("status")
-                if "due_date" in updates:
-                    t.due_date = updates.get("due_date")
-                if "priority" in updates:
-                    t.priority = updates.get("priority")
-                t.updated_at = now_iso()
-                tasks[i] = t
-                break
-        if not found:
-            raise KeyError(f"task not found: {task_id}")
-        self.save(tasks)
-        return t
+        return self._commit(lambda: self._update(task_id, updates))
 
     def delete_task(self, task_id: str):
-        tasks = self.load()
-        new = [t for t in tasks if t.id != task_id]
-        if len(new) == len(tasks):
-            raise KeyError(f"task not found: {task_id}")
-        self.save(new)
+        self._commit(lambda: self._delete(task_id))
+
+    # the write bodies run inside batch(), which holds the exclusive lock
+    def _add(self, task: Task):
+        self._index(task)
+        self._append({"op": "put", "task": task.to_dict()})
+
+    def _update(self, task_id: str, updates: dict) -> Task:
+        t = self._require(task_id)
+        old_status = t.status
+        apply_updates(t, updates)
+        if t.status != old_status:
+            self._by_status.get(old_status, {}).pop(t.id, None)
+            self._by_status.setdefault(t.status, {})[t.id] = t
+        self._terms_changed(t.id)
+        self._append({"op": "put", "task": t.to_dict()})
+        return t
+
+    def _delete(self, task_id: str):
+        self._unindex(self._require(task_id))
+        self._append({"op": "del", "id": task_id})
+
+    def _current(self) -> bool:
+        """Whether the in-memory index reflects the files on disk."""
+        return self._loaded and self._file_stamp() == self._stamp and self._journal_size() == self._journal_offset
 
     def list_tasks(self, status: Optional[str] = None, q: Optional[str] = None) -> List[Task]:
-        tasks = self.load()
-        if status:
-            tasks = [t for t in tasks if t.status == status]
-        if q:
-            ql = q.lower()
-            tasks = [t for t in tasks if ql in (t.title or "").lower() or ql in (t.description or "").lower()]
+        if q and not self._loaded:
+            # answer from the sidecar without loading every task; see iter_tasks
+            return list(self.iter_tasks(status=status, q=q))
+        with self._locked():
+            self._refresh()
+            if q:
+                words = query_words(q)
+                ids: Set[str] = set()
+                index = self._sidecar()
+                if index is not None:
+                    with index:
+                        ids = {index.record(p)[0] for p in index.search(words)}
+                # tasks changed since the snapshot are matched from memory instead
+                ids -= self._touched
+                ids.update(i for i in self._touched if i in self._tasks and matches(words, self._tasks[i].title, self._tasks[i].description))
+                tasks = sorted((self._tasks[i] for i in ids if i in self._tasks), key=lambda t: self._pos[t.id])
+                if status:
+                    tasks = [t for t in tasks if t.status == status]
+            elif status:
+                # status buckets can be out of file order after updates; restore it
+                tasks = sorted(self._by_status.get(status, {}).values(), key=lambda t: self._pos[t.id])
+            else:
+                tasks = list(self._tasks.values())
         return tasks
 
+    def iter_tasks(self, status: Optional[str] = None, q: Optional[str] = None) -> Iterator[Task]:
+        """Yield matching tasks lazily, in `list_tasks` order.
+
+        An index that is already loaded and current is used as is. Otherwise
+        the snapshot is parsed one record at a time and filtered as it goes,
+        so memory stays flat however large the store is (the journal, which
+        compaction keeps small, is read up front and overlaid).
+
+        Text searches take the snapshot positions of the matches from the
+        `.idx` sidecar (built from the stream if missing) and overlay the
+        journal. The matching records are then read by seeking to their
+        offsets or, in a gzipped snapshot or when many match, by streaming up
+        to the last match without creating a `Task` for the records between.
+
+        The lock is released before streaming, so writers are not held up by
+        a slow consumer. On POSIX they replace the snapshot under the open
+        stream; on Windows, where an open file cannot be replaced, a rewrite
+        waits up to `REPLACE_TIMEOUT` for the stream to be closed, and a
+        journal compaction that still cannot replace it is postponed.
+        """
+        # for searches: snapshot position -> journal version of the task (None
+        # to read it from the snapshot), byte offsets if seekable, and the
+        # journal tasks that match but are not in the snapshot
+        found: Optional[Dict[int, Optional[dict]]] = None
+        offsets: Optional[Dict[int, int]] = None
+        tail: List[dict] = []
+        columns: Optional[List[str]] = None
+        with self._locked():
+            if self._current():
+                cached = self.list_tasks(status=status, q=q)
+            else:
+                cached = None
+                deleted: Set[str] = set()
+                overrides = self._journal_overrides(deleted)
+                if q:
+                    found = {}
+                    words = query_words(q)
+                    index = self._sidecar()
+                    if index is not None:
+                        with index:
+                            found = dict.fromkeys(index.search(words))
+                            placed: Dict[str, int] = {}
+                            for tid in overrides:
+                                p = index.position(tid)
+                                if p >= 0:
+                                    found.pop(p, None)
+                                    placed[tid] = p
+                            if index.seekable and len(found) <= index.count * SEEK_FRACTION:
+                                offsets = {p: index.record(p)[1] for p in found}
+                                columns = index.columns
+                    else:
+                        placed = {}
+                    for tid, d in overrides.items():
+                        if d is None or not matches(words, d.get("title"), d.get("description")):
+                            continue
+                        if tid in placed and tid not in deleted:
+                            found[placed[tid]] = d
+                        else:
+                            # added, or deleted and re-added, since the snapshot
+                            tail.append(d)
+                    overrides = {}
+                # the open handle keeps this snapshot readable even if it is replaced
+                try:
+                    if found is None:
+                        snapshot = self._open_snapshot()
+                    elif not found:
+                        snapshot = None
+                    elif offsets is not None:
+                        snapshot = open(self.path, "rb")
+                    else:
+                        snapshot = self._open_snapshot()
+                except FileNotFoundError:
+                    snapshot = None
+        if cached is not None:
+            yield from cached
+            return
+
+        def wanted(d: dict) -> bool:
+            return not status or d.get("status", "open") == status
+
+        if snapshot is not None and found is not None:
+            with snapshot:
+                if offsets is not None:
+                    for p in sorted(found):
+                        d = found[p] or _read_record(snapshot, offsets[p], columns)
+                        if d is not None and wanted(d):
+                            yield Task.from_dict(d)
+                else:
+                    last = max(found)
+                    for p, d in enumerate(_stream_records(snapshot)):
+                        if p > last:
+                            break
+                        if p in found:
+                            d = found[p] or d
+                            if wanted(d):
+                                yield Task.from_dict(d)
+        elif snapshot is not None:
+            with snapshot:
+                for d in _stream_records(snapshot):
+                    tid = d.get("id")
+                    if tid in overrides:
+                        if tid in deleted:
+                            # re-added since the snapshot; it comes with the new tasks
+                            continue
+                        d = overrides.pop(tid)
+                        if d is None:
+                            continue
+                    if wanted(d):
+                        yield Task.from_dict(d)
+        # tasks added since the last compaction
+        for d in tail + [d for d in overrides.values() if d is not None]:
+            if wanted(d):
+                yield Task.from_dict(d)
+
+    def _journal_size(self) -> int:
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def _journal_overrides(self, deleted: Optional[Set[str]] = None) -> Dict[str, Optional[dict]]:
+        """Latest journal state per task id: the task dict, or None if deleted.
+
+        Ids deleted by the journal at some point are added to `deleted`.
+        """
+        overrides: Dict[str, Optional[dict]] = {}
+        try:
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return overrides
+
+        def visit(rec: dict):
+            op = rec.get("op")
+            if op == "put":
+                tid = rec["task"]["id"]
+                if tid in overrides and overrides[tid] is None:
+                    # a re-added id goes to the end, as it does in the index
+                    del overrides[tid]
+                overrides[tid] = rec["task"]
+            elif op == "del":
+                overrides.pop(rec.get("id"), None)
+                overrides[rec.get("id")] = None
+                if deleted is not None:
+                    deleted.add(rec.get("id"))
+            elif op == "batch":
+                for sub in rec.get("ops", []):
+                    visit(sub)
+
+        for rec in _journal_records(data)[0]:
+            visit(rec)
+        return overrides
+
     def get(self, task_id: str) -> Task:
-        tasks = self.load()
-        for t in tasks:
-            if t.id == task_id:
-                return t
-        raise KeyError(f"task not found: {task_id}")
+        with self._locked():
+            return self._require(task_id)
@@ -1,8 +1,13 @@
 import os
 import json
 import tempfile
+from ..tasks_cli import storage as storage_mod
 from ..tasks_cli.storage import JSONStorage
 from ..tasks_cli.models import Task
+from ..tasks_cli.search import TermIndex
+from ..tasks_cli.sqlite_storage import SQLiteStorage
+from ..tasks_cli.partitioned import PartitionedStorage
+from ..tasks_cli.cli import main
 
 
 def test_create_and_persist(tmp_path: any):
@@ -60,3 +65,493 @@ def test_list_and_search(tmp_path: any):
     found = storage.list_tasks(q="report")
     assert len(found) == 1
     assert found[0].title == "Write report"
+
+    # a query with no searchable words matches nothing rather than everything
+    assert storage.list_tasks(q="!!!") == []
+    assert list(storage.iter_tasks(q="?", status="open")) == []
+
+
+def test_index_reuses_load_and_sees_external_changes(tmp_path: any):
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db))
+
+    a = Task.create("First")
+    b = Task.create("Second")
+    storage.add_task(a)
+    storage.add_task(b)
+    storage.update_task(a.id, status="completed")
+    storage.update_task(a.id, status="open")
+
+    # status buckets keep file order even after a task moved between them
+    assert [t.title for t in storage.list_tasks(status="open")] == ["First", "Second"]
+    assert storage.list_tasks(status="completed") == []
+
+    # a second writer changes the file; the first storage picks it up
+    other = JSONStorage(path=str(db))
+    other.update_task(b.id, title="Second (edited)")
+    other.add_task(Task.create("Third"))
+    assert storage.get(b.id).title == "Second (edited)"
+    assert len(storage.load()) == 3
+
+
+def test_journal_appends_and_replays(tmp_path: any):
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db))
+
+    a = Task.create("Journaled")
+    b = Task.create("Removed")
+    storage.add_task(a)
+    storage.add_task(b)
+    storage.update_task(a.id, status="completed")
+    storage.delete_task(b.id)
+
+    # writes only touch the journal until it is compacted
+    assert not db.exists()
+    with open(storage.journal_path, "r", encoding="utf-8") as f:
+        assert [json.loads(line)["op"] for line in f] == ["put", "put", "put", "del"]
+
+    # a torn final line (crash mid-append) is ignored on replay
+    with open(storage.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "task": {"id"')
+    tasks = JSONStorage(path=str(db)).load()
+    assert [(t.title, t.status) for t in tasks] == [("Journaled", "completed")]
+
+
+def test_journal_compaction(tmp_path: any):
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db))
+    storage.compact_bytes = 500
+
+    ids = []
+    for i in range(10):
+        t = Task.create(f"Task {i}")
+        storage.add_task(t)
+        ids.append(t.id)
+
+    # the journal was folded into the snapshot at least once
+    with open(db, "r", encoding="utf-8") as f:
+        assert len(json.load(f)["tasks"]) >= 2
+
+    storage.compact()
+    assert not os.path.exists(storage.journal_path)
+    assert [t.id for t in JSONStorage(path=str(db)).load()] == ids
+
+
+def test_sqlite_storage_matches_json_api(tmp_path: any):
+    db = tmp_path / "tasks.sqlite"
+    storage = SQLiteStorage(str(db))
+
+    a = Task.create("Write report", description="monthly report")
+    b = Task.create("Buy milk", description="for coffee")
+    storage.add_task(a)
+    storage.add_task(b)
+    storage.update_task(b.id, status="completed", title="Buy oat milk")
+
+    assert [t.title for t in storage.load()] == ["Write report", "Buy oat milk"]
+    assert [t.id for t in storage.list_tasks(status="open")] == [a.id]
+    assert [t.id for t in storage.list_tasks(q="rep")] == [a.id]
+    assert [t.id for t in storage.list_tasks(q="oat", status="completed")] == [b.id]
+    assert storage.list_tasks(q="oat", status="open") == []
+
+    storage.delete_task(a.id)
+    try:
+        storage.get(a.id)
+        assert False, "expected KeyError"
+    except KeyError:
+        pass
+    storage.close()
+    assert SQLiteStorage(str(db)).get(b.id).status == "completed"
+
+
+def test_sqlite_update_does_not_lose_concurrent_update(tmp_path: any, monkeypatch):
+    import threading
+    import time
+    from ..tasks_cli import sqlite_storage
+
+    db = tmp_path / "tasks.sqlite"
+    storage = SQLiteStorage(str(db))
+    task = Task.create("Draft")
+    storage.add_task(task)
+
+    def retitle():
+        other = SQLiteStorage(str(db))
+        other.update_task(task.id, title="Final")
+        other.close()
+
+    # another writer updates the task between our read and our write
+    thread = threading.Thread(target=retitle)
+    apply_updates = sqlite_storage.apply_updates
+
+    def racing_apply_updates(t, updates):
+        monkeypatch.setattr(sqlite_storage, "apply_updates", apply_updates)
+        thread.start()
+        time.sleep(0.2)
+        apply_updates(t, updates)
+
+    monkeypatch.setattr(sqlite_storage, "apply_updates", racing_apply_updates)
+    storage.update_task(task.id, status="completed")
+    thread.join()
+
+    got = storage.get(task.id)
+    assert (got.title, got.status) == ("Final", "completed")
+
+
+def test_migrate_json_to_sqlite(tmp_path: any, capsys):
+    src = tmp_path / "tasks.json"
+    json_storage = JSONStorage(path=str(src))
+    json_storage.add_task(Task.create("Keep me"))
+
+    dst = tmp_path / "tasks.sqlite"
+    assert main(["--db", str(dst), "migrate", "--source", str(src)]) == 0
+    assert "migrated 1 tasks" in capsys.readouterr().out
+    assert [t.title for t in SQLiteStorage(str(dst)).load()] == ["Keep me"]
+
+
+def test_concurrent_writers_do_not_lose_updates(tmp_path: any):
+    import threading
+
+    db = tmp_path / "tasks.json"
+    workers = [JSONStorage(path=str(db)) for _ in range(4)]
+
+    def create(storage, n):
+        for i in range(n):
+            storage.add_task(Task.create(f"task {i}"))
+
+    threads = [threading.Thread(target=create, args=(s, 25)) for s in workers]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    assert len(JSONStorage(path=str(db)).load()) == 100
+    assert sum(s.lock_stats["exclusive"] for s in workers) == 100
+
+
+def test_threads_sharing_a_store_group_commit(tmp_path: any, monkeypatch):
+    import threading
+    import time
+
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db))
+    existing = Task.create("Existing")
+    storage.add_task(existing)
+    fsyncs = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (fsyncs.append(fd), fsync(fd)))
+
+    errors = []
+
+    def write(n):
+        try:
+            if n == 0:
+                storage.delete_task("no-such-id")
+            else:
+                storage.add_task(Task.create(f"task {n}"))
+        except KeyError as e:
+            errors.append(e)
+
+    # while the lock is held the first writer waits for it and the rest queue up
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    with storage._locked(exclusive=True):
+        for th in threads:
+            th.start()
+        deadline = time.monotonic() + 5
+        while len(storage._queue) < 7 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    for th in threads:
+        th.join()
+
+    # one commit for the first writer and one for all the others; the failing write is skipped
+    assert len(fsyncs) <= 2
+    assert len(errors) == 1
+    assert len(JSONStorage(path=str(db)).load()) == 8
+
+
+def test_batch_writes_once_and_rolls_back(tmp_path: any):
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db))
+    keep = Task.create("Keep")
+    storage.add_task(keep)
+
+    with storage.batch():
+        storage.add_task(Task.create("One"))
+        storage.update_task(keep.id, status="completed")
+    with open(storage.journal_path, "r", encoding="utf-8") as f:
+        assert [json.loads(line)["op"] for line in f] == ["put", "batch"]
+    assert len(JSONStorage(path=str(db)).load()) == 2
+
+    try:
+        with storage.batch():
+            storage.delete_task(keep.id)
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    assert storage.get(keep.id).status == "completed"
+    assert len(JSONStorage(path=str(db)).load()) == 2
+
+
+def test_iter_tasks_streams_snapshot_and_journal(tmp_path: any):
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db))
+    tasks = [Task.create(f"Task {i}", description="bulk" if i % 2 else None) for i in range(5)]
+    for t in tasks:
+        storage.add_task(t)
+    storage.compact()
+    # journal changes on top of the snapshot
+    storage.update_task(tasks[1].id, status="completed")
+    storage.delete_task(tasks[3].id)
+    storage.add_task(Task.create("Late bulk", description="bulk"))
+
+    fresh = JSONStorage(path=str(db))
+    assert [t.title for t in fresh.iter_tasks(status="open")] == ["Task 0", "Task 2", "Task 4", "Late bulk"]
+    assert not fresh._loaded
+    # text search goes through the sidecar index without loading the store
+    assert [t.title for t in fresh.iter_tasks(q="bulk")] == ["Task 1", "Late bulk"]
+    assert [t.title for t in fresh.list_tasks(q="task", status="open")] == ["Task 0", "Task 2", "Task 4"]
+    assert fresh.list_tasks(q="nothing") == []
+    assert not fresh._loaded
+    assert os.path.exists(storage.index_path)
+    # the same answers from a loaded index
+    assert [t.title for t in storage.iter_tasks(status="open")] == ["Task 0", "Task 2", "Task 4", "Late bulk"]
+
+
+def test_stream_records_across_chunks(tmp_path: any, monkeypatch):
+    from ..tasks_cli import storage as storage_mod
+
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db))
+    storage.save([Task.create("x" * 50 + str(i)) for i in range(20)])
+    monkeypatch.setattr(storage_mod, "STREAM_CHUNK", 7)
+    assert len(list(JSONStorage(path=str(db)).iter_tasks())) == 20
+
+
+def test_rows_layout_roundtrip(tmp_path: any):
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db), layout="rows")
+    a = Task.create("Row one", description='with "quotes"')
+    b = Task.create("Row two")
+    storage.save([a, b])
+
+    with open(db, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["rows"][0][1] == "Row one"
+
+    # layout is detected on read and kept on the next compaction
+    reopened = JSONStorage(path=str(db))
+    assert reopened.load() == [a, b]
+    assert [t.title for t in JSONStorage(path=str(db)).iter_tasks(q="quotes")] == ["Row one"]
+    reopened.update_task(b.id, status="completed")
+    reopened.compact()
+    with open(db, "r", encoding="utf-8") as f:
+        assert "rows" in json.load(f)
+
+
+def test_task_from_dict_fills_missing_fields():
+    t = Task.from_dict({"id": "abc", "title": "Old record"})
+    assert (t.status, t.description, t.priority) == ("open", None, None)
+    assert Task.from_dict(t.to_dict()) == t
+    assert Task.from_row(t.to_row()) == t
+
+
+def test_term_index_prefix_and_sidecar(tmp_path: any):
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db))
+    report = Task.create("Monthly report", description="finance")
+    milk = Task.create("Buy milk")
+    storage.add_task(report)
+    storage.add_task(milk)
+
+    # every word must prefix-match; order does not matter
+    assert [t.id for t in storage.list_tasks(q="rep MON")] == [report.id]
+    assert storage.list_tasks(q="report milk") == []
+    assert [t.id for t in storage.list_tasks(q="m")] == [report.id, milk.id]
+
+    # kept up to date incrementally
+    storage.update_task(milk.id, title="Buy oat milk")
+    storage.delete_task(report.id)
+    assert [t.id for t in storage.list_tasks(q="oat")] == [milk.id]
+    assert storage.list_tasks(q="finance") == []
+
+    # the next search after a compaction writes the sidecar; a new process reuses it and replays the journal
+    storage.compact()
+    assert not os.path.exists(storage.index_path)
+    assert [t.id for t in storage.list_tasks(q="oat")] == [milk.id]
+    with TermIndex.open(storage.index_path, storage._file_stamp()) as index:
+        assert [index.record(pos)[0] for pos in index.search(["oat"])] == [milk.id]
+    storage.add_task(Task.create("Oatmeal"))
+    assert [t.title for t in JSONStorage(path=str(db)).list_tasks(q="oat")] == ["Buy oat milk", "Oatmeal"]
+
+
+def test_batch_command_applies_ops_in_one_write(tmp_path: any, monkeypatch, capsys):
+    import io
+
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db))
+    existing = Task.create("Existing")
+    storage.add_task(existing)
+
+    ops = [
+        {"op": "create", "title": "From batch"},
+        {"op": "edit", "id": existing.id, "title": "Existing (edited)"},
+        {"op": "complete", "id": existing.id},
+        {"op": "delete", "id": "no-such-id"},
+    ]
+    stdin = "\n".join(json.dumps(op) for op in ops) + "\n\nnot json\n"
+    monkeypatch.setattr("sys.stdin", io.StringIO(stdin))
+    assert main(["--db", str(db), "batch"]) == 2
+
+    out = capsys.readouterr().out.splitlines()
+    results = [json.loads(line) for line in out[:-1]]
+    assert [r["ok"] for r in results] == [True, True, True, False, False]
+    assert results[3]["error"] == "task not found: no-such-id"
+    assert results[4]["line"] == 6
+    assert out[-1] == "Error: 2 of 5 operations failed"
+
+    # the successful ops were written together, as one journal record
+    with open(storage.journal_path, "r", encoding="utf-8") as f:
+        assert [json.loads(line)["op"] for line in f] == ["put", "batch"]
+    tasks = JSONStorage(path=str(db)).load()
+    assert [(t.title, t.status) for t in tasks] == [("Existing (edited)", "completed"), ("From batch", "open")]
+
+
+def test_batch_command_atomic(tmp_path: any, monkeypatch, capsys):
+    import io
+
+    for name in ("tasks.json", "tasks.sqlite"):
+        db = tmp_path / name
+        stdin = '{"op": "create", "title": "Kept?"}\n{"op": "complete"}\n'
+        monkeypatch.setattr("sys.stdin", io.StringIO(stdin))
+        assert main(["--db", str(db), "batch", "--atomic"]) == 2
+        assert "nothing was saved" in capsys.readouterr().out
+        assert main(["--db", str(db), "list"]) == 0
+        assert capsys.readouterr().out == ""
+
+
+def test_encodings_are_detected_and_converted(tmp_path: any, capsys):
+    import gzip
+
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db), encoding="compact")
+    storage.save([Task.create("Encoded", description="über")])
+    with open(db, "r", encoding="utf-8") as f:
+        text = f.read()
+    assert text.startswith('{"format":"compact",') and "\n" not in text
+
+    assert main(["--db", str(db), "convert", "--encoding", "gzip", "--layout", "rows"]) == 0
+    assert "gzip encoding, rows layout" in capsys.readouterr().out
+    with gzip.open(db, "rt", encoding="utf-8") as f:
+        assert json.load(f)["format"] == "gzip"
+
+    # detected on read, streamed, and kept when the journal is compacted
+    reopened = JSONStorage(path=str(db))
+    assert [t.description for t in reopened.iter_tasks()] == ["über"]
+    reopened.add_task(Task.create("Second"))
+    reopened.compact()
+    assert [t.title for t in JSONStorage(path=str(db)).load()] == ["Encoded", "Second"]
+    with open(db, "rb") as f:
+        assert f.read(2) == b"\x1f\x8b"
+
+
+def _task_created(title, created_at):
+    t = Task.create(title)
+    t.created_at = created_at
+    return t
+
+
+def test_partitioned_storage_reads_hot_shards(tmp_path: any):
+    store = tmp_path / "tasks"
+    storage = PartitionedStorage(str(store))
+    done = _task_created("Old and done", "2025-01-05T10:00:00Z")
+    old_open = _task_created("Old but open", "2025-02-01T10:00:00Z")
+    recent = _task_created("Recent", "2026-10-01T10:00:00Z")
+    for t in (done, old_open, recent):
+        storage.add_task(t)
+    storage.update_task(done.id, status="completed")
+
+    with open(store / "manifest.json", "r", encoding="utf-8") as f:
+        shards = json.load(f)["shards"]
+    assert shards == {
+        "2025-01": {"tasks": 1, "open": 0},
+        "2025-02": {"tasks": 1, "open": 1},
+        "2026-10": {"tasks": 1, "open": 1},
+    }
+
+    fresh = PartitionedStorage(str(store))
+    assert [t.title for t in fresh.list_tasks()] == ["Old but open", "Recent"]
+    assert "2025-01" not in fresh._shards
+    assert [t.title for t in fresh.list_tasks(history=True)] == ["Old and done", "Old but open", "Recent"]
+
+    # lookups fall back to cold shards
+    fresh.update_task(done.id, title="Old, done, renamed")
+    fresh.delete_task(old_open.id)
+    assert fresh.get(done.id).title == "Old, done, renamed"
+    assert [t.title for t in fresh.list_tasks(status="open")] == ["Recent"]
+
+    # a lost manifest is rebuilt from the shard files
+    os.remove(store / "manifest.json")
+    assert [t.title for t in PartitionedStorage(str(store)).load()] == ["Old, done, renamed", "Recent"]
+
+
+def test_partitioned_cli_migrate_and_batch(tmp_path: any, monkeypatch, capsys):
+    import io
+
+    src = tmp_path / "tasks.json"
+    JSONStorage(path=str(src)).save([_task_created("Archived", "2024-12-24T08:00:00Z"), Task.create("Current")])
+    store = str(tmp_path / "tasks") + os.sep
+    assert main(["--db", store, "migrate", "--source", str(src)]) == 0
+    assert sorted(os.listdir(tmp_path / "tasks"))[0] == "2024-12.json"
+    capsys.readouterr()
+
+    monkeypatch.setattr("sys.stdin", io.StringIO('{"op": "create", "title": "Batched"}\n{"op": "delete", "id": "nope"}\n'))
+    assert main(["--db", store, "batch", "--atomic"]) == 2
+    capsys.readouterr()
+    assert main(["--db", store, "list", "--history"]) == 0
+    assert [line.split("] ", 1)[1] for line in capsys.readouterr().out.splitlines()] == ["Archived", "Current"]
+
+
+def test_journal_append_after_torn_tail(tmp_path: any):
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db))
+    storage.add_task(Task.create("Before crash"))
+    with open(storage.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "task": {"id"')
+
+    # a new process appends after the crash; its record must not be glued to the fragment
+    after = JSONStorage(path=str(db))
+    after.add_task(Task.create("After crash"))
+    assert [t.title for t in JSONStorage(path=str(db)).load()] == ["Before crash", "After crash"]
+    with open(storage.journal_path, "r", encoding="utf-8") as f:
+        assert all(json.loads(line) for line in f)
+
+
+def test_snapshot_replace_waits_for_windows_readers(tmp_path: any, monkeypatch):
+    db = tmp_path / "tasks.json"
+    storage = JSONStorage(path=str(db))
+    storage.compact_bytes = 1
+    storage.add_task(Task.create("First"))
+
+    # simulate a stream that keeps the snapshot open for two attempts
+    real_replace = os.replace
+    attempts = []
+
+    def busy_replace(src, dst):
+        attempts.append(dst)
+        if len(attempts) <= 2:
+            raise PermissionError(13, "in use", dst)
+        real_replace(src, dst)
+
+    monkeypatch.setattr(storage_mod, "_RETRY_REPLACE", True)
+    monkeypatch.setattr(storage_mod.os, "replace", busy_replace)
+    storage.add_task(Task.create("Second"))
+    assert len(attempts) == 3
+    assert not os.path.exists(storage.journal_path)
+
+    # a reader that never lets go only postpones compaction
+    def locked_replace(src, dst):
+        raise PermissionError(13, "in use", dst)
+
+    monkeypatch.setattr(storage_mod, "REPLACE_TIMEOUT", 0.0)
+    monkeypatch.setattr(storage_mod.os, "replace", locked_replace)
+    storage.add_task(Task.create("Third"))
+    assert os.path.exists(storage.journal_path)
+    assert [t.title for t in JSONStorage(path=str(db)).load()] == ["First", "Second", "Third"]